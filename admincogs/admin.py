@@ -59,7 +59,7 @@ class Admin(commands.Cog):
                 out.append(f'# {guild.name}:' if guild else f'# {guild_id}:')
                 out.extend([f'\t {prefix}' for prefix in prefixes])
         elif ctx.guild:
-            out = self.cfg['prefix'][str(ctx.guild.id)]
+            out = list(self.cfg['prefix'][str(ctx.guild.id)])
         else:
             out = []
         out.extend(
@@ -220,6 +220,22 @@ class Admin(commands.Cog):
                 view=view,
             )
 
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def permcache(self, ctx):
+        """Shows statistics on the permission decision cache."""
+
+        index = self.bot.permission_index
+        total = index.hits + index.misses
+        ratio = index.hits / total * 100 if total else 0.0
+        await ctx.sendmarkdown(
+            '# Permission decision cache:\n'
+            f'Cached members: {index.size}\n'
+            f'Hits: {index.hits}\n'
+            f'Misses: {index.misses}\n'
+            f'Hit ratio: {ratio:.1f}%'
+        )
+
     @commands.group(invoke_without_command=True, hidden=True)
     async def hierarchy(self, ctx):
         """Role hierarchy commands.
@@ -2,15 +2,138 @@ import logging
 import pprint
 import asyncio
 import discord
+from array import array
 from copy import copy
-from collections import namedtuple
-from discord.errors import Forbidden, NotFound
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from discord.errors import Forbidden, HTTPException, NotFound
 from discord.ext import commands
-from utils import SizedDict
+from discord.utils import snowflake_time, utcnow
+from utils import CommandLog, SizedDict, channel_bucket
 
 log = logging.getLogger(f'charfred.{__name__}')
 
-Command = namedtuple('Command', 'msg output')
+
+class CommandRecord:
+    """Compact command map entry.
+
+    Only the ids of the invoking message and its output are kept,
+    messages are rehydrated as partial messages, or looked up in the
+    client's message cache, and only fetched on a miss,
+    when they are actually needed.
+    """
+
+    __slots__ = ('message_id', 'channel_id', 'author_id', 'reinvokable', 'output')
+
+    def __init__(self, message, reinvokable=True):
+        self.message_id = message.id
+        self.channel_id = message.channel.id
+        self.author_id = message.author.id
+        self.reinvokable = reinvokable
+        self.output = array('Q')
+
+    def add_output(self, message):
+        self.output.append(message.id)
+
+    async def fetch(self, bot, channel):
+        message = bot._connection._get_message(self.message_id)
+        if message is not None:
+            return message
+        return await channel.fetch_message(self.message_id)
+
+    def __repr__(self):
+        return (
+            f'CommandRecord(message={self.message_id}, channel={self.channel_id}, '
+            f'author={self.author_id}, output={self.output.tolist()})'
+        )
+
+
+def _channel_author(cmd):
+    if cmd.reinvokable:
+        return (cmd.channel_id, cmd.author_id)
+    return None
+
+
+# Bulk deletion only accepts up to 100 messages younger than 14 days,
+# the margin keeps messages from aging out while a cleanup is running.
+BULK_MAX = 100
+BULK_MAX_AGE = timedelta(days=14) - timedelta(minutes=5)
+RETRIES = 3
+
+
+def _partition(channel, msg_ids) -> Tuple[List[List[int]], List[int]]:
+    """Splits message ids into bulk deletable batches and
+    ids that have to be deleted one by one."""
+
+    if not hasattr(channel, 'delete_messages'):  # DMs
+        return [], list(msg_ids)
+
+    cutoff = utcnow() - BULK_MAX_AGE
+    young = []
+    old = []
+    for msg_id in msg_ids:
+        if snowflake_time(msg_id) > cutoff:
+            young.append(msg_id)
+        else:
+            old.append(msg_id)
+    batches = [young[i:i + BULK_MAX] for i in range(0, len(young), BULK_MAX)]
+    return batches, old
+
+
+async def _delete_single(channel, msg_id, bucket) -> bool:
+    for attempt in range(RETRIES):
+        await bucket.acquire()
+        try:
+            await channel.get_partial_message(msg_id).delete()
+        except NotFound:
+            return True
+        except Forbidden:
+            return False
+        except HTTPException:
+            await asyncio.sleep(2 ** attempt)
+        else:
+            return True
+    return False
+
+
+async def _delete_batch(channel, batch, bucket) -> List[int]:
+    if len(batch) > 1:
+        await bucket.acquire()
+        try:
+            await channel.delete_messages([channel.get_partial_message(i) for i in batch])
+        except Forbidden:
+            # Bulk deletion needs Manage Messages, the bot's own messages
+            # can still be deleted one by one without it.
+            log.info('Bulk deletion not permitted, falling back to single deletions.')
+        except HTTPException:
+            log.info('Bulk deletion failed, falling back to single deletions.')
+        else:
+            return []
+
+    deleted = await asyncio.gather(*[_delete_single(channel, i, bucket) for i in batch])
+    return [i for i, ok in zip(batch, deleted) if not ok]
+
+
+async def cleanup_output(channel, msg_ids) -> List[int]:
+    """Deletes command output messages, bulk deleting where possible,
+    all batches and single deletions run concurrently, paced by the
+    channel's token bucket; failed deletions are retried.
+
+    Returns the ids of all messages that could not be deleted.
+    """
+
+    batches, singles = _partition(channel, msg_ids)
+    bucket = channel_bucket(channel.id)
+    results = await asyncio.gather(
+        *[_delete_batch(channel, batch, bucket) for batch in batches],
+        *[_delete_single(channel, msg_id, bucket) for msg_id in singles],
+    )
+
+    failed = []
+    for result in results[:len(batches)]:
+        failed.extend(result)
+    failed.extend(i for i, ok in zip(singles, results[len(batches):]) if not ok)
+    return failed
 
 
 class CommandHistorian(commands.Cog):
@@ -18,12 +141,45 @@ class CommandHistorian(commands.Cog):
         self.bot = bot
         self.botCfg = bot.cfg
         self.lock = asyncio.Lock()
-        self.pprinter = pprint.PrettyPrinter()
         if not hasattr(bot, 'cmd_map'):
             self.cmd_map = SizedDict()
             bot.cmd_map = self.cmd_map
         else:
             self.cmd_map = bot.cmd_map
+        # Eviction, deletion and clearing all keep this index in sync.
+        self.cmd_map.add_index('channel_author', _channel_author)
+        bot.register_core_cfg('cmdlogging', False)
+        self.logcmds = self.botCfg['cmdlogging']
+        self.cmdlog = CommandLog(bot.dir / 'logs' / 'commands')
+        # Seconds an edited command waits for further edits before reinvoking.
+        bot.register_core_cfg('reinvokedebounce', 1.0)
+        # Tasks running, or waiting to run, a command, by invoking message id.
+        self.inflight = {}
+        bot.before_invoke(self._track_invocation)
+        bot.after_invoke(self._untrack_invocation)
+
+    async def cog_unload(self):
+        if self.bot._before_invoke == self._track_invocation:
+            self.bot._before_invoke = None
+        if self.bot._after_invoke == self._untrack_invocation:
+            self.bot._after_invoke = None
+        for task in self.inflight.values():
+            task.cancel()
+        self.inflight.clear()
+        await self.cmdlog.close()
+
+    async def _track_invocation(self, ctx):
+        self.inflight[ctx.message.id] = asyncio.current_task()
+
+    async def _untrack_invocation(self, ctx):
+        if self.inflight.get(ctx.message.id) is asyncio.current_task():
+            del self.inflight[ctx.message.id]
+
+    def _cancel_inflight(self, msg_id):
+        task = self.inflight.pop(msg_id, None)
+        if task is not None and task is not asyncio.current_task():
+            log.info(f'Cancelling in-flight invocation of {msg_id}.')
+            task.cancel()
 
     @commands.Cog.listener()
     async def on_command(self, ctx):
@@ -31,10 +187,19 @@ class CommandHistorian(commands.Cog):
         and optionally logs command to users command history file.
         """
 
-        self.cmd_map[ctx.message.id] = Command(
-            msg=ctx.message,
-            output=[]
+        self.cmd_map[ctx.message.id] = CommandRecord(
+            ctx.message, reinvokable=ctx.command.qualified_name != 'last'
         )
+        if self.logcmds:
+            self.cmdlog.log({
+                'time': ctx.message.created_at.timestamp(),
+                'guild': ctx.guild.id if ctx.guild else None,
+                'channel': ctx.channel.id,
+                'author': ctx.author.id,
+                'author_name': str(ctx.author),
+                'command': ctx.command.qualified_name,
+                'content': ctx.message.content,
+            })
 
     @commands.Cog.listener()
     async def on_message_delete(self, message):
@@ -45,24 +210,19 @@ class CommandHistorian(commands.Cog):
         cmd_map and hasn\'t expired yet!
         """
 
+        self._cancel_inflight(message.id)
         if message.id in self.cmd_map:
-            log.info('Deleting previous command output!')
-            try:
-                await message.channel.delete_messages(self.cmd_map[message.id].output)
-            except KeyError:
-                log.error('Deletion of previous command output failed!')
-            except Forbidden:
-                log.error('No Permission!')
-            except NotFound:
-                log.warning('Some messages not found for deletion!')
-            else:
-                del self.cmd_map[message.id]
+            await self._cleanup(message.channel, message.id)
 
     @commands.Cog.listener()
     async def on_message_edit(self, before, after):
         """Reinvokes a command if it has been edited,
         and deletes previous command output.
 
+        Any still running invocation for the message is cancelled,
+        and the reinvocation is debounced, so rapid successive edits
+        only run the command once, for the final edit.
+
         Will only work if the command is still in the
         cmd_map and hasn\'t expired yet!
         """
@@ -70,20 +230,54 @@ class CommandHistorian(commands.Cog):
         if before.content == after.content:
             return
 
-        if before.id in self.cmd_map:
-            log.info('Deleting previous command output!')
-            try:
-                await before.channel.delete_messages(self.cmd_map[before.id].output)
-            except KeyError:
-                log.error('Deletion of previous command output failed!')
-            except Forbidden:
-                log.error('No Permission!')
-            except NotFound:
-                log.warning('Some messages not found for deletion!')
+        if before.id in self.cmd_map or before.id in self.inflight:
+            self._cancel_inflight(before.id)
+            self.inflight[before.id] = asyncio.get_event_loop().create_task(
+                self._reinvoke(before, after)
+            )
+
+    async def _reinvoke(self, before, after):
+        try:
+            await asyncio.sleep(self.botCfg['reinvokedebounce'])
+            # A cancelled predecessor may have already cleaned up.
+            if before.id in self.cmd_map:
+                cleaned = await self._cleanup(before.channel, before.id)
             else:
+                cleaned = True
+            if cleaned:
                 log.info(f'Reinvoking: {before.content} -> {after.content}')
-                del self.cmd_map[before.id]
                 await self.bot.on_message(after)
+        finally:
+            if self.inflight.get(after.id) is asyncio.current_task():
+                del self.inflight[after.id]
+
+    async def _cleanup(self, channel, msg_id) -> bool:
+        """Deletes the output of a command and removes it from the command map,
+        failed deletions stay on record, for another attempt later.
+
+        Returns whether all output was cleaned up.
+        """
+
+        try:
+            cmd = self.cmd_map[msg_id]
+        except KeyError:
+            log.error('Deletion of previous command output failed!')
+            return False
+
+        log.info('Deleting previous command output!')
+        total = len(cmd.output)
+        failed = await cleanup_output(channel, cmd.output.tolist())
+        log.info(f'Cleaned up {total - len(failed)} of {total} output messages.')
+        if failed:
+            log.warning(f'{len(failed)} output messages could not be deleted!')
+            cmd.output = array('Q', failed)
+            return False
+
+        try:
+            del self.cmd_map[msg_id]
+        except KeyError:
+            pass
+        return True
 
     def _removefrommap(self, ctx):
         log.info('Command removed from command map!')
@@ -102,10 +296,7 @@ class CommandHistorian(commands.Cog):
             self._removefrommap(ctx)
         elif isinstance(error, commands.CommandNotFound):
             if ctx.message.id not in self.cmd_map:
-                self.cmd_map[ctx.message.id] = Command(
-                    msg=ctx.message,
-                    output=[]
-                )
+                self.cmd_map[ctx.message.id] = CommandRecord(ctx.message)
 
     @commands.command(aliases=['!!'])
     async def last(self, ctx):
@@ -115,11 +306,17 @@ class CommandHistorian(commands.Cog):
         was invoked in.
         """
 
-        lastcmd = self.cmd_map.find(lambda cmd: (cmd.msg.channel.id == ctx.channel.id) and
-                                    (cmd.msg.author.id == ctx.author.id))
+        lastcmd = self.cmd_map.latest('channel_author', (ctx.channel.id, ctx.author.id))
         if lastcmd:
+            try:
+                lastmsg = await lastcmd.fetch(self.bot, ctx.channel)
+            except (NotFound, Forbidden):
+                log.info('Last command message is gone!')
+                del self.cmd_map[lastcmd.message_id]
+                await ctx.sendmarkdown('> Your last command message is gone!')
+                return
             log.info('Last command found, reinvoking...')
-            await self.bot.on_message(lastcmd.msg)
+            await self.bot.on_message(lastmsg)
         else:
             log.info('No last command found!')
             await ctx.sendmarkdown('> No recent command found in current channel!')
@@ -181,12 +378,38 @@ class CommandHistorian(commands.Cog):
     async def toggle(self, ctx):
         """Toggles command logging on and off."""
 
-        if self.logcmds:
-            self.logcmds = False
-        else:
-            self.logcmds = True
-        log.info('Toggled command logging ' + ('off!' if self.logcmds else 'on!'))
-        await ctx.sendmarkdown('# Toggled command logging ' + ('off!' if self.logcmds else 'on!'))
+        self.logcmds = not self.logcmds
+        self.botCfg['cmdlogging'] = self.logcmds
+        await self.botCfg.save()
+        if not self.logcmds:
+            await self.cmdlog.flush()
+        log.info('Toggled command logging ' + ('on!' if self.logcmds else 'off!'))
+        await ctx.sendmarkdown('# Toggled command logging ' + ('on!' if self.logcmds else 'off!'))
+
+    @cmdlogging.command(hidden=True)
+    @commands.is_owner()
+    async def search(self, ctx, command: str = None, hours: float = 24.0, limit: int = 20):
+        """Searches the command log of the current guild.
+
+        Takes an optional qualified command name, use quotes for
+        subcommands, how many hours to look back, and how many
+        entries to return at most, newest first.
+        """
+
+        since = utcnow().timestamp() - hours * 3600
+        entries = await self.cmdlog.search(
+            ctx.guild.id if ctx.guild else None, command=command, since=since, limit=limit
+        )
+        if not entries:
+            await ctx.sendmarkdown('> No matching commands logged!')
+            return
+
+        lines = [
+            f'{datetime.fromtimestamp(e["time"]).strftime("%Y-%m-%d %H:%M:%S")} '
+            f'[{e["author_name"]}]: {e["content"]}'
+            for e in reversed(entries)
+        ]
+        await ctx.sendmarkdown('\n'.join(lines))
 
     @commands.group(invoke_without_command=True, hidden=True)
     @commands.is_owner()
@@ -194,11 +417,17 @@ class CommandHistorian(commands.Cog):
         """Command Map commands.
 
         This returns a crude list of the current command map state,
+        (channel, author, reinvokable, output) per invoking message id,
         if no subcommand was given.
         """
 
         log.info('Showing cmd_map.')
-        rep = self.pprinter.pformat(self.cmd_map)
+        # Plain tuples only, the worker needs no unpickling of CommandRecords.
+        snapshot = {
+            key: (cmd.channel_id, cmd.author_id, cmd.reinvokable, cmd.output.tolist())
+            for key, cmd in self.cmd_map.items()
+        }
+        rep = await self.bot.processes.run(pprint.pformat, snapshot)
         await ctx.sendmarkdown(rep)
 
     @cmdmap.command(hidden=True)
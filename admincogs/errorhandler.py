@@ -3,6 +3,7 @@ import logging
 import random
 from discord import Webhook, Embed
 from discord.ext import commands
+from utils import SendableException
 
 log = logging.getLogger(f'charfred.{__name__}')
 
@@ -57,6 +58,13 @@ class ErrorHandler(commands.Cog):
                                    f'> Try again in {error.retry_after} seconds.')
             log.warning(f'CommandOnCooldown: {ctx.command.qualified_name}')
 
+        # Converters raising, e.g. PoolSaturated, arrive as ConversionError.
+        elif isinstance(
+            error, (commands.CommandInvokeError, commands.ConversionError)
+        ) and isinstance(error.original, SendableException):
+            await error.original.send(ctx)
+            log.warning(f'{error.original.__class__.__name__}: {ctx.command.qualified_name}')
+
         elif isinstance(error, commands.CommandInvokeError):
             await ctx.sendmarkdown('< ' + random.choice(self.keywords['nacks']) + ' >')
 
@@ -0,0 +1,121 @@
+"""Compares the Cache backed SizedDict and SimpleTTLDict with the
+OrderedDict scanning implementations they replaced, at 10k and 100k
+entries: inserts past max_size, reads, and latest-per-(channel, author)
+lookups, which used to be reverse scans with find.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cache
+"""
+
+import random
+import time
+from collections import OrderedDict
+
+from utils.collections import SimpleTTLDict, SizedDict
+
+
+class LegacySizedDict(OrderedDict):
+    def __init__(self, max_size=100):
+        super().__init__()
+        self.max_size = max_size
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        super().move_to_end(key)
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+
+    def find(self, predicate):
+        for value in reversed(self.values()):
+            if predicate(value):
+                return value
+
+
+class LegacySimpleTTLDict(OrderedDict):
+    def __init__(self, ttl_seconds=360):
+        super().__init__()
+        self.ttl = ttl_seconds
+
+    def _expire(self):
+        now = int(time.time())
+        while self:
+            (key, (value, date)) = super().popitem(last=False)
+            if now - date > self.ttl:
+                continue
+            super().__setitem__(key, (value, date))
+            super().move_to_end(key, last=False)
+            break
+
+    def __setitem__(self, key, value):
+        self._expire()
+        super().__setitem__(key, (value, int(time.time())))
+        super().move_to_end(key)
+
+    def find(self, predicate):
+        for (value, _) in reversed(self.values()):
+            if predicate(value):
+                return value
+
+
+def _channel_author(value):
+    return value[:2]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(name, new, legacy, n):
+    rng = random.Random(n)
+    # (channel, author, payload), a few hundred channels and authors.
+    values = [(rng.randrange(300), rng.randrange(300), i) for i in range(2 * n)]
+    probes = [values[rng.randrange(n, 2 * n)][:2] for _ in range(1000)]
+
+    new_cache = new()
+    new_cache.add_index('channel_author', _channel_author)
+    legacy_cache = legacy()
+
+    def fill(cache):
+        def _fill():
+            for i, v in enumerate(values):
+                cache[i] = v
+        return _fill
+
+    def read(cache):
+        def _read():
+            for i in range(n, 2 * n):
+                cache[i]
+        return _read
+
+    def find_new():
+        for probe in probes:
+            new_cache.latest('channel_author', probe)
+
+    def find_legacy():
+        for probe in probes:
+            legacy_cache.find(lambda v: v[:2] == probe)
+
+    rows = [
+        ('insert', 2 * n, timed(fill(legacy_cache)), timed(fill(new_cache))),
+        ('read', n, timed(read(legacy_cache)), timed(read(new_cache))),
+        ('latest', len(probes), timed(find_legacy), timed(find_new)),
+    ]
+    for op, count, old, cur in rows:
+        print(
+            f'{name:<14}{n:>8} {op:<8}'
+            f'{old / count * 1e6:>12.2f}us{cur / count * 1e6:>12.2f}us{old / cur:>9.1f}x'
+        )
+
+
+def main():
+    print(f'{"":<14}{"entries":>8} {"op":<8}{"legacy":>14}{"cache":>14}{"speedup":>10}')
+    for n in (10_000, 100_000):
+        run('SizedDict', lambda: SizedDict(max_size=n), lambda: LegacySizedDict(max_size=n), n)
+        run('SimpleTTLDict', lambda: SimpleTTLDict(3600), lambda: LegacySimpleTTLDict(3600), n)
+
+
+if __name__ == '__main__':
+    main()
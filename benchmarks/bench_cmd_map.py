@@ -0,0 +1,116 @@
+"""Bytes per command map entry, measured with tracemalloc: full
+discord.Message objects for the invocation and its output, as the
+command map kept them before, against CommandRecords holding ids only.
+
+Messages are built offline from gateway payloads, each entry has one
+invoking message and two output messages.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cmd_map
+"""
+
+import asyncio
+import gc
+import tracemalloc
+from collections import namedtuple
+
+import discord
+from discord import Intents
+
+from admincogs.commandhistorian import CommandRecord
+from utils import SizedDict
+
+Command = namedtuple('Command', 'msg output')
+
+GUILD_ID = 1
+CHANNEL_ID = 2
+BOT_ID = 3
+AUTHORS = 100
+
+
+def payload(msg_id, author_id, content):
+    return {
+        'id': str(msg_id),
+        'channel_id': str(CHANNEL_ID),
+        'author': {
+            'id': str(author_id), 'username': f'user{author_id}',
+            'discriminator': '0', 'avatar': None, 'global_name': None,
+        },
+        'content': content,
+        'timestamp': '2024-01-01T00:00:00+00:00',
+        'edited_timestamp': None,
+        'tts': False,
+        'mention_everyone': False,
+        'mentions': [],
+        'mention_roles': [],
+        'attachments': [],
+        'embeds': [],
+        'pinned': False,
+        'type': 0,
+    }
+
+
+def make_payloads(n):
+    payloads = []
+    for i in range(n):
+        base = 10**17 + i * 3
+        payloads.append((
+            payload(base, 1000 + i % AUTHORS, f'!status server{i % 7} --verbose'),
+            [payload(base + j, BOT_ID, 'x' * 500) for j in (1, 2)],
+        ))
+    return payloads
+
+
+def legacy_entry(state, channel, invocation, outputs):
+    msg = discord.Message(state=state, channel=channel, data=invocation)
+    return Command(msg=msg, output=[
+        discord.Message(state=state, channel=channel, data=o) for o in outputs
+    ])
+
+
+def compact_entry(state, channel, invocation, outputs):
+    record = CommandRecord(discord.Message(state=state, channel=channel, data=invocation))
+    for o in outputs:
+        record.add_output(discord.Message(state=state, channel=channel, data=o))
+    return record
+
+
+def bytes_per_entry(make_entry, state, channel, payloads):
+    cmd_map = SizedDict(max_size=len(payloads))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for invocation, outputs in payloads:
+        cmd_map[int(invocation['id'])] = make_entry(state, channel, invocation, outputs)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained / len(payloads)
+
+
+async def main():
+    client = discord.Client(intents=Intents.none())
+    state = client._connection
+    guild = discord.Guild(state=state, data={
+        'id': str(GUILD_ID), 'name': 'guild', 'roles': [], 'emojis': [], 'stickers': [],
+        'features': [], 'channels': [], 'members': [], 'member_count': 0,
+    })
+    channel = discord.TextChannel(state=state, guild=guild, data={
+        'id': str(CHANNEL_ID), 'name': 'general', 'type': 0, 'position': 0,
+        'guild_id': str(GUILD_ID), 'permission_overwrites': [],
+    })
+    # Users are cached by the connection state either way, store them up front.
+    for invocation, outputs in make_payloads(AUTHORS):
+        legacy_entry(state, channel, invocation, outputs)
+
+    print(f'{"entries":>8}{"Message":>12}{"CommandRecord":>15}{"ratio":>8}')
+    for n in (1_000, 10_000):
+        payloads = make_payloads(n)
+        legacy = bytes_per_entry(legacy_entry, state, channel, payloads)
+        compact = bytes_per_entry(compact_entry, state, channel, payloads)
+        print(f'{n:>8}{legacy:>11,.0f}B{compact:>14,.0f}B{legacy / compact:>7.1f}x')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
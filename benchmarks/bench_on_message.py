@@ -0,0 +1,161 @@
+"""Messages per second, and peak bytes allocated while handling a
+message, through Charfred.on_message compared to the on_message it
+replaced, which built a Context for every message before finding out
+it was chat.
+
+Both bots run offline, with stand-in messages: guild chat, guild
+commands, and chat in DMs from someone other than the owner.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_on_message
+"""
+
+import asyncio
+import logging
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+from discord import Intents
+from discord.ext import commands
+
+import charfred
+from utils import CharfredContext, LoopMonitor, Metrics, PrefixMatcher, SizedDict, Store
+
+log = logging.getLogger('charfred')
+
+BOT_ID = 123456789012345678
+OWNER_ID = 42
+MESSAGES = 20_000
+
+
+def legacy_get_prefixes(bot, msg):
+    bot_id = bot.user.id
+    prefixes = [f'<@{bot_id}> ', f'<@!{bot_id}> ']
+    if msg.guild:
+        try:
+            prefixes.extend(bot.cfg['prefix'][str(msg.guild.id)])
+        except KeyError:
+            pass
+    return prefixes
+
+
+class LegacyBot(commands.Bot):
+    async def get_context(self, message, *, cls=CharfredContext):
+        return await super().get_context(message, cls=cls)
+
+    async def on_command(self, ctx):
+        log.info(f'[{ctx.author.name}]: {ctx.message.content}')
+
+    async def on_message(self, message):
+        if message.author.bot:
+            return
+        if message.guild is None:
+            is_owner = await self.is_owner(message.author)
+            if not is_owner:
+                return
+        ctx = await self.get_context(message)
+        await self.invoke(ctx)
+
+
+@commands.command()
+async def status(ctx):
+    pass
+
+
+def setup(bot, cfg):
+    bot.loop = asyncio.get_running_loop()
+    bot._connection.user = SimpleNamespace(id=BOT_ID)
+    bot.owner_id = OWNER_ID
+    bot.cfg = cfg
+    bot.add_command(status)
+    return bot
+
+
+def new_bot(cfg):
+    bot = charfred.Charfred.__new__(charfred.Charfred)
+    commands.Bot.__init__(bot, command_prefix=charfred._get_prefixes, intents=Intents.none())
+    bot.prefixes = PrefixMatcher(cfg)
+    bot._dm_owners = SizedDict(max_size=256)
+    bot.metrics = Metrics()
+    bot.loop_monitor = LoopMonitor()
+    return setup(bot, cfg)
+
+
+def legacy_bot(cfg):
+    return setup(LegacyBot(command_prefix=legacy_get_prefixes, intents=Intents.none()), cfg)
+
+
+def make_messages(rng, bot, kind, prefixes):
+    words = ['hello', 'anyone', 'on', 'the', 'server', 'lag', 'again', 'gg', 'brb', 'lol']
+    guild = None if kind == 'dm chat' else SimpleNamespace(id=1000)
+    messages = []
+    for i in range(MESSAGES):
+        if kind == 'command':
+            content = rng.choice(prefixes) + 'status'
+        else:
+            content = ' '.join(rng.choices(words, k=rng.randrange(1, 12)))
+        messages.append(SimpleNamespace(
+            id=i,
+            content=content,
+            guild=guild,
+            author=SimpleNamespace(id=rng.randrange(200), bot=False, name='someone'),
+            channel=SimpleNamespace(id=2000),
+            attachments=[],
+            _state=bot._connection,
+        ))
+    return messages
+
+
+async def handle(bot, messages):
+    for i, msg in enumerate(messages):
+        await bot.on_message(msg)
+        if i % 100 == 0:
+            await asyncio.sleep(0)  # Let dispatched command events run.
+    await asyncio.sleep(0)
+
+
+async def measure(bot, messages):
+    await handle(bot, messages[:1000])  # Warm up caches on both sides.
+
+    rate = 0
+    for _ in range(3):
+        start = time.perf_counter()
+        await handle(bot, messages)
+        rate = max(rate, len(messages) / (time.perf_counter() - start))
+
+    sample = messages[:2000]
+    total = 0
+    tracemalloc.start()
+    for msg in sample:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await bot.on_message(msg)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    await asyncio.sleep(0)
+    return rate, total / len(sample)
+
+
+async def main():
+    rng = random.Random(8)
+    prefixes = ['!', '?', '$', 'cf ', 'charfred ']
+    with tempfile.TemporaryDirectory() as tmp:
+        cfg = Store(Path(tmp) / 'botCfg', load=False)
+        cfg.store = {'prefix': {'1000': prefixes}}
+        bots = {'legacy': legacy_bot(cfg), 'fast path': new_bot(cfg)}
+
+        print(f'{"traffic":<10}{"bot":<11}{"msg/s":>10}{"bytes/msg":>11}')
+        for kind in ('chat', 'command', 'dm chat'):
+            for name, bot in bots.items():
+                messages = make_messages(rng, bot, kind, prefixes)
+                rate, allocated = await measure(bot, messages)
+                print(f'{kind:<10}{name:<11}{rate:>10,.0f}{allocated:>11,.0f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""Messages per second through prefix resolution, for guilds with
+2 to 500 prefixes: the list rebuilding _get_prefixes this replaced,
+followed by discord.py trying every prefix in turn, against the
+compiled per-guild PrefixMatcher.
+
+Traffic is mostly chat, with one message in twenty being a command.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_prefixes
+"""
+
+import random
+import string
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from charfred import _get_prefixes
+from utils import PrefixMatcher, Store
+
+BOT_ID = 123456789012345678
+MESSAGES = 50_000
+
+
+def legacy_get_prefixes(bot, msg):
+    bot_id = bot.user.id
+    prefixes = [f'<@{bot_id}> ', f'<@!{bot_id}> ']
+    if msg.guild:
+        try:
+            prefixes.extend(bot.cfg['prefix'][str(msg.guild.id)])
+        except KeyError:
+            pass
+    return prefixes
+
+
+def legacy_resolve(bot, msg):
+    # What discord.py does with a list of prefixes.
+    content = msg.content
+    for prefix in legacy_get_prefixes(bot, msg):
+        if content.startswith(prefix):
+            return prefix
+    return None
+
+
+def resolve(bot, msg):
+    prefix = _get_prefixes(bot, msg)
+    return prefix if msg.content.startswith(prefix) else None
+
+
+def make_prefixes(rng, count):
+    prefixes = set()
+    while len(prefixes) < count:
+        word = ''.join(rng.choices(string.ascii_lowercase, k=rng.randrange(1, 6)))
+        prefixes.add(rng.choice('!?.$%&+-') + word + rng.choice(('', ' ')))
+    return sorted(prefixes)
+
+
+def make_messages(rng, guild, prefixes):
+    words = ['hello', 'anyone', 'on', 'the', 'server', 'lag', 'again', 'gg', 'brb', 'lol']
+    messages = []
+    for _ in range(MESSAGES):
+        content = ' '.join(rng.choices(words, k=rng.randrange(1, 12)))
+        if rng.random() < 0.05:
+            content = rng.choice(prefixes) + 'status'
+        messages.append(SimpleNamespace(guild=guild, content=content))
+    return messages
+
+
+def rate(fn, bot, messages):
+    start = time.perf_counter()
+    for msg in messages:
+        fn(bot, msg)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        cfg = Store(Path(tmp) / 'botCfg', load=False)
+        cfg.store = {'prefix': {}}
+        bot = SimpleNamespace(user=SimpleNamespace(id=BOT_ID), cfg=cfg)
+        bot.prefixes = PrefixMatcher(cfg)
+
+        print(f'{"prefixes":>9}{"legacy msg/s":>15}{"matcher msg/s":>15}{"speedup":>9}')
+        for count in (2, 10, 50, 200, 500):
+            guild = SimpleNamespace(id=1000 + count)
+            prefixes = make_prefixes(rng, count)
+            cfg['prefix'][str(guild.id)] = prefixes
+            messages = make_messages(rng, guild, prefixes)
+
+            assert [legacy_resolve(bot, m) for m in messages] == [resolve(bot, m) for m in messages]
+            legacy = rate(legacy_resolve, bot, messages)
+            matcher = rate(resolve, bot, messages)
+            print(f'{count:>9}{legacy:>15,.0f}{matcher:>15,.0f}{matcher / legacy:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
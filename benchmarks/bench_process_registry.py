@@ -0,0 +1,73 @@
+"""Costs of finding out whether a server is running on a host with
+1k processes: the psutil.process_iter scan isUp did on every call,
+against ProcessRegistry.is_running, cold (one scan), warm (pid and
+create time check) and for a stopped server (remembered miss).
+
+Spawns 1k sleep processes, plus one posing as a server, all of
+which are killed again on exit; pass another count as argument.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_process_registry [processes]
+"""
+
+import subprocess
+import sys
+import time
+
+import psutil
+
+from spiffymanagement import ProcessRegistry
+
+
+def legacy_is_up(server: str) -> bool:
+    # As isUp was, but for zombies, which have no cmdline and used to crash it.
+    for process in psutil.process_iter(attrs=['cmdline']):
+        if f'{server}.jar' in (process.info['cmdline'] or ()):
+            return True
+    return False
+
+
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def main(count: int = 1000):
+    filler = []
+    try:
+        for _ in range(count):
+            filler.append(subprocess.Popen(['sleep', '600']))
+        # Runs as: sh -c 'sleep 600' java -jar Alpha.jar
+        server = subprocess.Popen(['sh', '-c', 'sleep 600', 'java', '-jar', 'Alpha.jar'])
+        filler.append(server)
+        time.sleep(0.5)
+        print(f'{len(psutil.pids())} processes on the host')
+
+        assert legacy_is_up('Alpha') and not legacy_is_up('Beta')
+        registry = ProcessRegistry(miss_ttl=1.0)
+        assert registry.is_running('Alpha')
+
+        rows = [
+            ('isUp scan, running', per_call(lambda: legacy_is_up('Alpha'), 20)),
+            ('isUp scan, stopped', per_call(lambda: legacy_is_up('Beta'), 20)),
+            ('registry, cold', per_call(
+                lambda: ProcessRegistry().is_running('Alpha'), 20)),
+            ('registry, running', per_call(lambda: registry.is_running('Alpha'), 10_000)),
+            ('registry, stopped', per_call(lambda: registry.is_running('Beta'), 10_000)),
+        ]
+        for name, seconds in rows:
+            print(f'{name:<22}{seconds * 1e6:>12.1f}us')
+    finally:
+        for process in filler:
+            for child in psutil.Process(process.pid).children():
+                child.kill()
+            process.kill()
+        for process in filler:
+            process.wait()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
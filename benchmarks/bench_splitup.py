@@ -0,0 +1,73 @@
+"""Splits megabyte-size log dumps with splitup, given as a string and
+as a file, plain and codeblocked; reports throughput, the number of
+chunks and peak memory allocated while splitting.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_splitup
+"""
+
+import io
+import random
+import time
+import tracemalloc
+
+from utils.mixed import splitup
+
+
+def log_dump(size: int) -> str:
+    rng = random.Random(size)
+    levels = ('INFO', 'WARN', 'ERROR')
+    lines = []
+    total = 0
+    while total < size:
+        if rng.random() < 0.01:
+            # Stack traces and the like, far longer than a message.
+            line = 'at ' + 'x' * rng.randrange(2000, 6000) + '\n'
+        else:
+            line = (
+                f'[12:{rng.randrange(60):02d}:{rng.randrange(60):02d}] '
+                f'[Server thread/{rng.choice(levels)}]: '
+                + 'lorem ipsum ' * rng.randrange(1, 12)
+                + '\n'
+            )
+        lines.append(line)
+        total += len(line)
+    return ''.join(lines)
+
+
+def measure(make_input, codeblocked):
+    msg = make_input()
+    start = time.perf_counter()
+    chunks = sum(1 for _ in splitup(msg, codeblocked=codeblocked))
+    elapsed = time.perf_counter() - start
+
+    msg = make_input()
+    tracemalloc.start()
+    for _ in splitup(msg, codeblocked=codeblocked):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, chunks, peak
+
+
+def main():
+    print(f'{"size":>6} {"input":<7}{"codeblock":<10}{"MB/s":>9}{"chunks":>9}{"peak":>11}')
+    for mb in (1, 8):
+        dump = log_dump(mb * 1024 * 1024)
+        fenced = f'```\n{dump}```'
+        inputs = {
+            'str': (lambda: dump, lambda: fenced),
+            'file': (lambda: io.StringIO(dump), lambda: io.StringIO(fenced)),
+        }
+        for name, (plain, block) in inputs.items():
+            for codeblocked, make_input in ((False, plain), (True, block)):
+                elapsed, chunks, peak = measure(make_input, codeblocked)
+                print(
+                    f'{mb:>4}MB {name:<7}{str(codeblocked):<10}'
+                    f'{mb / elapsed:>9.1f}{chunks:>9}{peak / 1024:>9.0f}KB'
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Compares load time, save time and file size of a Store holding a
+synthetic botCfg with 10k permission nodes, for each serializer whose
+backend is installed, plain stdlib json included; and the latency of
+a journaled save of a single changed node against a full save.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_store
+"""
+
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from utils import serializers as ser
+from utils.store import Store
+
+NODES = 10_000
+
+
+def synthetic_cfg(nodes: int = NODES) -> dict:
+    rng = random.Random(nodes)
+    roles = [None, '@everyone', 'Moderator', 'Admin', 'Server Staff']
+    cogs = max(1, nodes // 100)
+    cfg = {
+        'prefix': {str(rng.randrange(10**17, 10**18)): ['!', '?'] for _ in range(50)},
+        'nodes': {'__core__': 'Admin'},
+        'hierarchy': roles[1:],
+        'cogcfgs': {f'cog{i}.setting': rng.random() for i in range(200)},
+    }
+    for c in range(cogs):
+        cog = cfg['nodes'][f'Cog{c}'] = {'__core__': rng.choice(roles)}
+        for n in range(nodes // cogs - 1):
+            cog[f'cog{c} command{n} subcommand'] = rng.choice(roles)
+    return cfg
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_serializer(name, serializer, cfg, directory: Path):
+    # Registered under its name for the duration, so Store picks it up.
+    registered = ser.serializers.get(serializer.name)
+    ser.serializers[serializer.name] = serializer
+    try:
+        store = Store(directory / name, load=False, serializer=serializer.name)
+        store.store = cfg
+        save = best_of(lambda: asyncio.run(store.save()))
+        load = best_of(lambda: Store(directory / name, serializer=serializer.name))
+        size = store.file.stat().st_size
+    finally:
+        if registered is None:
+            del ser.serializers[serializer.name]
+        else:
+            ser.serializers[serializer.name] = registered
+    print(f'{name:<10}{save * 1000:>10.1f}ms{load * 1000:>10.1f}ms{size / 1024:>10.0f}KB')
+
+
+def bench_journal(cfg, directory: Path):
+    async def run():
+        store = Store(directory / 'journaled', load=False, journaled=True,
+                      compact_threshold=1 << 30)
+        store.store = cfg
+        await store.save()
+
+        node = store['nodes']['Cog0']
+        start = time.perf_counter()
+        for i in range(100):
+            node['__core__'] = 'Admin' if i % 2 else 'Moderator'
+            await store.save()
+        journaled = (time.perf_counter() - start) / 100
+
+        start = time.perf_counter()
+        for _ in range(10):
+            store._full = True
+            await store.save()
+        full = (time.perf_counter() - start) / 10
+        return journaled, full
+
+    journaled, full = asyncio.run(run())
+    print(f'\nSave of one changed node: journaled {journaled * 1000:.2f}ms, '
+          f'full snapshot {full * 1000:.2f}ms')
+
+
+def main():
+    cfg = synthetic_cfg()
+    candidates = [('json', ser.JsonSerializer())]
+    if ser.orjson:
+        candidates.append(('orjson', ser.OrjsonSerializer()))
+    if ser.msgpack:
+        candidates.append(('msgpack', ser.MsgpackSerializer()))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        print(f'{NODES} permission nodes')
+        print(f'{"":<10}{"save":>12}{"load":>12}{"size":>12}')
+        for name, serializer in candidates:
+            bench_serializer(name, serializer, cfg, directory)
+        bench_journal(cfg, directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,8 @@ import datetime
 import logging
 import logging.handlers
 import os
+import time
 import traceback
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Optional
 
@@ -14,7 +14,17 @@ import coloredlogs
 from discord import ClientException, Intents
 from discord.ext import commands
 
-from utils import CharfredContext, Store
+from utils import (
+    CharfredContext,
+    ExecutorRegistry,
+    LoopMonitor,
+    Metrics,
+    PermissionIndex,
+    PrefixMatcher,
+    ProcessLane,
+    SizedDict,
+    Store,
+)
 
 log = logging.getLogger('charfred')
 
@@ -45,14 +55,12 @@ def _admincogs(direc):
 
 
 def _get_prefixes(bot, msg):
-    bot_id = bot.user.id
-    prefixes = [f'<@{bot_id}> ', f'<@!{bot_id}> ']
-    if msg.guild:
-        try:
-            prefixes.extend(bot.cfg['prefix'][str(msg.guild.id)])
-        except KeyError:
-            pass
-    return prefixes
+    # Only hand the one matching prefix to discord.py, or, if none matches,
+    # the bot mention prefix, which is then known not to match either.
+    prefix = bot.prefixes.match(bot.user.id, msg)
+    if prefix is None:
+        return bot.prefixes.mention(bot.user.id)
+    return prefix
 
 
 class Charfred(commands.Bot):
@@ -72,7 +80,13 @@ class Charfred(commands.Bot):
                 ('hierarchy', []),
                 ('cogcfgs', {}),
             ],
+            journaled=True,
+            save_delay=2.0,
         )
+        self.permission_index = PermissionIndex(self.cfg)
+        self.prefixes = PrefixMatcher(self.cfg)
+        self._dm_owners = SizedDict(max_size=256)
+        self.metrics = Metrics()
         self.keywords = Store(
             self.dir / 'configs/keywords',
             boot_store=self.dir / 'configs/keywords_default',
@@ -99,6 +113,18 @@ class Charfred(commands.Bot):
     async def get_context(self, message, *, cls=CharfredContext):
         return await super().get_context(message, cls=cls)
 
+    async def invoke(self, ctx):
+        if ctx.command is None:
+            await super().invoke(ctx)
+            return
+
+        self.loop_monitor.label(f'command {ctx.command.qualified_name}')
+        start = time.perf_counter()
+        await super().invoke(ctx)
+        elapsed = time.perf_counter() - start
+        self.metrics.observe('command', ctx.command.qualified_name, elapsed, ctx.command_failed)
+        self.metrics.observe('cog', ctx.command.cog_name or 'None', elapsed, ctx.command_failed)
+
     async def on_command(self, ctx):
         log.info(f'[{ctx.author.name}]: {ctx.message.content}')
 
@@ -108,11 +134,40 @@ class Charfred(commands.Bot):
         if not hasattr(self, 'uptime'):
             self.uptime = datetime.datetime.now()
 
+    async def on_guild_role_create(self, role):
+        self.permission_index.invalidate_guild(role.guild.id)
+
+    async def on_guild_role_update(self, before, after):
+        self.permission_index.invalidate_guild(after.guild.id)
+
+    async def on_guild_role_delete(self, role):
+        self.permission_index.invalidate_guild(role.guild.id)
+
+    async def on_member_update(self, before, after):
+        if before.roles != after.roles:
+            self.permission_index.invalidate_member(after.guild.id, after.id)
+
+    async def on_member_join(self, member):
+        self.permission_index.invalidate_member(member.guild.id, member.id)
+
+    async def on_member_remove(self, member):
+        self.permission_index.invalidate_member(member.guild.id, member.id)
+
+    async def on_guild_remove(self, guild):
+        self.permission_index.invalidate_guild(guild.id)
+
     async def on_message(self, message):
         if message.author.bot:
             return
+        # Most traffic is plain chat, drop it before building a Context.
+        if self.prefixes.match(self.user.id, message) is None:
+            return
         if message.guild is None:
-            is_owner = await self.is_owner(message.author)
+            try:
+                is_owner = self._dm_owners[message.author.id]
+            except KeyError:
+                is_owner = await self.is_owner(message.author)
+                self._dm_owners[message.author.id] = is_owner
             if not is_owner:
                 return
         ctx = await self.get_context(message)
@@ -120,17 +175,32 @@ class Charfred(commands.Bot):
 
     async def close(self):
         log.info('Shutting down, this may take a couple seconds...')
+        self.loop_monitor.stop()
         await super().close()
         log.info('Client disconnected.')
+        await self.cfg.close()
+        log.info('Config saved.')
         await self.session.close()
         log.info('Session closed.')
+        self.executors.shutdown(wait=False)
+        self.processes.shutdown(wait=False)
+        log.info('Executors shut down.')
         log.info('All done, goodbye sir!')
 
     async def setup_hook(self) -> None:
         loop = asyncio.get_event_loop()
 
-        self.executor = ThreadPoolExecutor(thread_name_prefix='charfred')
-        loop.set_default_executor(self.executor)
+        # Blocking work is split by class, so a few slow profiling jobs
+        # can't hold up config saves; unnamed run_in_executor calls go to io.
+        self.executors = ExecutorRegistry()
+        loop.set_default_executor(self.executors.register('io', workers=8))
+        self.executors.register('cpu', workers=2, max_queue=4)
+        self.executors.register('subprocess', workers=4, max_queue=16)
+        # Picklable CPU-bound jobs that would hold the GIL go here instead.
+        self.processes = ProcessLane()
+
+        self.loop_monitor = LoopMonitor(root=self.dir)
+        self.loop_monitor.start()
 
         self.session = aiohttp.ClientSession(loop=loop)
 
@@ -14,7 +14,10 @@ setup(
         'psutil'],
     extras_require={
         'uvloop': ['uvloop'],
-        'asyncpg': ['asyncpg']
+        'asyncpg': ['asyncpg'],
+        'orjson': ['orjson'],
+        'msgpack': ['msgpack'],
+        'test': ['pytest', 'hypothesis']
     },
     package_data={
         '': ['*.json', '*.json_default']
@@ -4,7 +4,7 @@ import os
 import logging
 import coloredlogs
 import spiffymanagement
-from utils import Store
+from utils import ProcessLane, Store
 
 log = logging.getLogger('spiffymanagement')
 coloredlogs.install(level='DEBUG',
@@ -13,7 +13,6 @@ coloredlogs.install(level='DEBUG',
 
 dirp = os.path.dirname(os.path.realpath(__file__))
 _cfg = Store(Path(f'{dirp}/configs/botCfg'))
-_cfg._load()
 
 
 class Settings():
@@ -21,16 +20,19 @@ class Settings():
         self,
         parent_directory: str,
         backup_directory: str,
-        backup_maxAge: int
+        backup_maxAge: int,
+        ready_pattern: str = spiffymanagement.READY_PATTERN
     ) -> None:
         self.parent_directory = Path(parent_directory)
         self.backup_directory = Path(backup_directory)
         self.backup_maxAge = backup_maxAge
+        self.ready_pattern = ready_pattern
 
 cfg = Settings(
     parent_directory=_cfg['spiffy.parentdirectory'],
     backup_directory=_cfg['spiffy.backupdirectory'],
-    backup_maxAge=int(_cfg['spiffy.backupmaxage'])
+    backup_maxAge=int(_cfg['spiffy.backupmaxage']),
+    ready_pattern=_cfg.get('spiffy.readypattern', spiffymanagement.READY_PATTERN)
 )
 
 
@@ -68,8 +70,9 @@ def status(server):
 @spiffy.command()
 @click.argument('servers', nargs=-1)
 def backup(servers):
-    for server in servers:
-        spiffymanagement.backup(cfg, server)
+    with ProcessLane() as lane:
+        for server in servers:
+            spiffymanagement.backup(cfg, server, lane=lane)
 
 
 @spiffy.command()
@@ -83,4 +86,5 @@ def terminate(servers):
 @click.argument('server')
 @click.argument('specific_path')
 def specialbackup(server, specific_path):
-    spiffymanagement.backup(cfg, server, specific_path)
+    with ProcessLane() as lane:
+        spiffymanagement.backup(cfg, server, specific_path, lane=lane)
@@ -1,45 +1,236 @@
 import logging
+import asyncio
+import errno
 import os
 import re
+import select
+import stat
 import tarfile
+import threading
+from abc import ABC, abstractmethod
 from datetime import datetime
 from pathlib import Path
 from subprocess import run
-from time import sleep, time
+from time import monotonic, sleep, time
 from typing import TYPE_CHECKING, List
 
 import psutil
 
+from utils.exceptions import SendableException
+from utils.processlane import report
+from utils.rcon import RconInterrupted, RconPool, rcon_settings
+
 if TYPE_CHECKING:
     from spiffy import Settings
+    from utils import ProcessLane
 
 log = logging.getLogger('spiffymanagement')
 
 
-def screenCmd(server, *cmds):
-    for cmd in cmds:
-        run(['screen', '-S', server, '-X', 'stuff', f'{cmd}\r'])
+class ConsoleTransport(ABC):
+    """Sends lines to a server's console, all lines of one send at once.
+
+    Sending returns the server's responses, one per line, for transports
+    that get to see them, None otherwise.
+    """
+
+    @abstractmethod
+    def send(self, *lines: str) -> List[str] | None:
+        ...
+
+
+class ScreenTransport(ConsoleTransport):
+    """Stuffs lines into the server's screen session,
+    a single 'screen -X stuff' call per send."""
+
+    def __init__(self, server: str) -> None:
+        self.server = server
+
+    def send(self, *lines: str) -> None:
+        if lines:
+            stuffing = ''.join(f'{line}\r' for line in lines)
+            run(['screen', '-S', self.server, '-X', 'stuff', stuffing])
+
+
+class PipeTransport(ConsoleTransport):
+    """Writes lines straight into a named pipe the server reads its
+    console input from, i.e. its invocation has to feed the server's
+    stdin from that pipe.
+
+    The pipe is kept open between sends. While the pipe is full, sends
+    wait up to `timeout` seconds for the server to drain it; lines that
+    could not be written, because the pipe stayed full or nothing is
+    reading from it, are sent through the given fallback transport.
+    """
+
+    def __init__(self, path: Path, fallback: ConsoleTransport, timeout: float = 5.0) -> None:
+        self.path = path
+        self.fallback = fallback
+        self.timeout = timeout
+        self._fd = None
+        # Rest of a line only partly written when the pipe stayed full.
+        self._tail = b''
+
+    def _open(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+        return self._fd
+
+    def _close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._tail = b''
+
+    def send(self, *lines: str) -> List[str] | None:
+        if not lines:
+            return None
+        tail, self._tail = self._tail, b''
+        data = tail + ''.join(f'{line}\n' for line in lines).encode()
+        written = 0
+        reopened = False
+        deadline = monotonic() + self.timeout
+        while written < len(data):
+            try:
+                written += os.write(self._open(), data[written:])
+            except BlockingIOError:
+                remaining = deadline - monotonic()
+                if remaining <= 0 or not select.select([], [self._fd], [], remaining)[1]:
+                    log.warning(f'{self.path} stayed full, falling back!')
+                    break
+            except BrokenPipeError:
+                # Reopen once, in case the server was restarted; a line
+                # cut short went down with the old reader, so resend it,
+                # unless it is the rest of one from an earlier send.
+                self._close()
+                if reopened:
+                    log.warning(f'Nothing is reading {self.path}, falling back!')
+                    break
+                reopened = True
+                written = max(data.rfind(b'\n', 0, written) + 1, len(tail))
+            except OSError as e:
+                self._close()
+                if e.errno != errno.ENXIO:  # ENXIO: Nothing reading.
+                    raise
+                log.warning(f'Nothing is reading {self.path}, falling back!')
+                break
+        else:
+            return None
+
+        if self._fd is not None and written and data[written - 1] != ord('\n'):
+            # Part of the line is in the pipe already, it is finished on
+            # the next send rather than sent again through the fallback.
+            end = data.index(b'\n', written) + 1
+            self._tail = data[written:end]
+            written = end
+        sent = data.count(b'\n', 0, written) - (1 if tail else 0)
+        return self.fallback.send(*lines[max(sent, 0):])
+
+
+class RconTransport(ConsoleTransport):
+    """Runs lines as commands over RCON, returning the server's responses.
+
+    Pooled connections live on a background event loop, shared by all
+    RCON transports; if RCON fails sends fall back to the given transport,
+    for those lines the server did not respond to.
+    """
+
+    _loop = None
+    _pools: dict[Path, RconPool] = {}
+
+    def __init__(self, server: str, serverdir: Path, fallback: ConsoleTransport) -> None:
+        self.server = server
+        self.parent_directory = serverdir.parent
+        self.fallback = fallback
+
+    @classmethod
+    def _background(cls) -> asyncio.AbstractEventLoop:
+        if cls._loop is None:
+            cls._loop = asyncio.new_event_loop()
+            threading.Thread(target=cls._loop.run_forever, name='spiffy-rcon', daemon=True).start()
+        return cls._loop
+
+    def send(self, *lines: str) -> List[str] | None:
+        if not lines:
+            return []
+        try:
+            pool = self._pools[self.parent_directory]
+        except KeyError:
+            pool = self._pools[self.parent_directory] = RconPool(self.parent_directory)
+        future = asyncio.run_coroutine_threadsafe(
+            pool.command(self.server, *lines), self._background()
+        )
+        try:
+            return future.result()
+        except RconInterrupted as e:
+            # Lines that got a response ran already, only resend the rest.
+            done = e.responses
+            log.warning(f'{e} Falling back for the remaining {len(lines) - len(done)} lines.')
+            rest = self.fallback.send(*lines[len(done):])
+            return None if rest is None else done + rest
+        except (SendableException, OSError, asyncio.TimeoutError) as e:
+            log.warning(f'RCON to {self.server} failed: {getattr(e, "message", e)}, falling back!')
+            return self.fallback.send(*lines)
+
+
+_consoles: dict[str, ConsoleTransport] = {}
+
+
+def console(server: str, serverdir: Path | None = None) -> ConsoleTransport:
+    """Get the console transport for a server.
+
+    Servers with a 'spiffy_console' named pipe in their directory are
+    written to directly, servers with RCON enabled are sent commands
+    over RCON, all others go through their screen session.
+    Transports are remembered by server name, so later lookups do not
+    need the server's directory.
+    """
+
+    if serverdir is not None:
+        screen = ScreenTransport(server)
+        sc = serverdir / 'spiffy_console'
+        try:
+            is_pipe = stat.S_ISFIFO(sc.stat().st_mode)
+        except FileNotFoundError:
+            is_pipe = False
+        if is_pipe:
+            _consoles[server] = PipeTransport(sc, screen)
+        else:
+            try:
+                rcon_settings(server, serverdir / 'server.properties')
+            except SendableException:
+                _consoles[server] = screen
+            else:
+                _consoles[server] = RconTransport(server, serverdir, screen)
+
+    try:
+        return _consoles[server]
+    except KeyError:
+        transport = _consoles[server] = ScreenTransport(server)
+        return transport
+
+
+def screenCmd(server, *cmds) -> List[str] | None:
+    """Sends commands to a server's console, in one go.
+
+    Returns the responses to the commands, if the server's console
+    transport gets to see them.
+    """
+
+    return console(server).send(*cmds)
 
 
 def run_startup_commands(server):
     """
-    Custom commands ran at startup with a delay
+    Custom commands ran once a server is ready
     """
-    if server in ('Techopolis',):  # Short startup times
-        sleepy = (80, 10)
-    elif server in ('Rag6',):  # Long startup times
-        sleepy = (240, 10)
-    else:  # Everything else
-        sleepy = (180, 10)
-
-    log.info('Forceload removing %s in T minus %d!', server, sleepy[0])
-    sleep(sleepy[0])
+    log.info('Forceload removing %s!', server)
     forceload_removeall(server)
 
     if server in ('Techopolis',):
         trigger_reload(server)
 
-    sleep(sleepy[1])
+    sleep(10)
     forceload_removeall(server)
     log.info('You\'re not you, you\'re me!')
 
@@ -48,9 +239,10 @@ def forceload_removeall(server):
     """
     Some servers do not unload chunks properly unless being forced
     """
-    screenCmd(server, 'forceload remove all')
     screenCmd(
-        server, 'execute in compactmachines:compact_world run forceload remove all'
+        server,
+        'forceload remove all',
+        'execute in compactmachines:compact_world run forceload remove all',
     )
 
 
@@ -154,6 +346,37 @@ def get_invocation(serverdir: Path) -> List[str]:
     return invocation
 
 
+def get_ready_pattern(serverdir: Path, default: str) -> str:
+    """Get the pattern marking a given server as ready.
+
+    Parameters
+    ----------
+    serverdir
+        path to server
+    default
+        pattern to use if the server has no 'spiffy_ready' file
+
+    Returns
+    -------
+        contents of the 'spiffy_ready' file, or the default
+    """
+
+    sr = serverdir / 'spiffy_ready'
+
+    try:
+        with sr.open() as file:
+            return file.read().strip() or default
+    except FileNotFoundError:
+        return default
+
+
+def wants_startup_commands(serverdir: Path) -> bool:
+    """Whether a server has opted into the startup commands, by having
+    a 'spiffy_startup' file next to its 'spiffy_ready' file."""
+
+    return (serverdir / 'spiffy_startup').exists()
+
+
 def get_backup(serverdir: Path) -> dict[str, List[Path]]:
     """Get all directories to backup for a given server.
 
@@ -205,6 +428,86 @@ def get_backup(serverdir: Path) -> dict[str, List[Path]]:
     return specification
 
 
+class ProcessRegistry:
+    """Keeps track of server processes, so finding one does not mean
+    walking every process on the host each time.
+
+    A single scan resolves the processes of all servers at once, by the
+    '<server>.jar' in their invocation. Known processes are verified by
+    pid and create time, which psutil does without a scan, and only a
+    miss triggers a rescan; misses are remembered for `miss_ttl` seconds,
+    so polling for a stopped server does not scan on every poll either.
+    """
+
+    def __init__(self, miss_ttl: float = 1.0):
+        self.miss_ttl = miss_ttl
+        self._procs: dict[str, psutil.Process] = {}
+        self._misses: dict[str, float] = {}
+
+    def _scan(self):
+        procs = {}
+        for process in psutil.process_iter(attrs=['cmdline']):
+            for arg in process.info['cmdline'] or ():
+                if arg.endswith('.jar'):
+                    procs[arg] = process
+        self._procs = procs
+        self._misses.clear()
+
+    def get(self, server: str) -> psutil.Process | None:
+        """Returns the running process of a server, or None."""
+
+        jar = f'{server}.jar'
+        process = self._procs.get(jar)
+        if process is not None:
+            if process.is_running():
+                return process
+            del self._procs[jar]
+
+        missed = self._misses.get(jar)
+        if missed is not None and monotonic() - missed < self.miss_ttl:
+            return None
+
+        self._scan()
+        process = self._procs.get(jar)
+        if process is None:
+            self._misses[jar] = monotonic()
+        return process
+
+    def is_running(self, server: str) -> bool:
+        return self.get(server) is not None
+
+    def wait_for_exit(self, server: str, timeout: float) -> bool:
+        """Blocks until the server's process has exited, for at most
+        timeout seconds; psutil waits on a pidfd where it can, so this
+        returns right as the process exits.
+
+        Returns True if the server is not running (anymore).
+        """
+
+        process = self.get(server)
+        if process is None:
+            return True
+        try:
+            process.wait(timeout)
+        except psutil.TimeoutExpired:
+            return False
+        self.forget(server)
+        return True
+
+    def forget(self, server: str):
+        """Drops everything known about a server, e.g. after starting it."""
+
+        jar = f'{server}.jar'
+        self._procs.pop(jar, None)
+        self._misses.pop(jar, None)
+
+
+processes = ProcessRegistry()
+
+# Seconds a server gets to shut down after 'stop', before it is terminated.
+STOP_TIMEOUT = 120
+
+
 def isUp(server: str) -> bool:
     """Determine if a server is running.
 
@@ -219,10 +522,7 @@ def isUp(server: str) -> bool:
         boolean indicating running or not
     """
 
-    for process in psutil.process_iter(attrs=['cmdline']):
-        if f'{server}.jar' in process.info['cmdline']:
-            return True
-    return False
+    return processes.is_running(server)
 
 
 def termProc(server: str) -> bool:
@@ -240,20 +540,104 @@ def termProc(server: str) -> bool:
         False if process was not found
     """
 
-    for process in psutil.process_iter(attrs=['cmdline']):
-        if f'{server}.jar' in process.info['cmdline']:
-            toKill = process.children()
-            toKill.append(process)
-            for p in toKill:
-                p.terminate()
-            _, alive = psutil.wait_procs(toKill, timeout=3)
-            for p in alive:
-                p.kill()
-            _, alive = psutil.wait_procs(toKill, timeout=3)
-            if not alive:
-                return True
+    process = processes.get(server)
+    if process is None:
+        return False
+
+    try:
+        toKill = process.children()
+    except psutil.NoSuchProcess:
+        return True
+    toKill.append(process)
+    for p in toKill:
+        try:
+            p.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, alive = psutil.wait_procs(toKill, timeout=3)
+    for p in alive:
+        p.kill()
+    _, alive = psutil.wait_procs(toKill, timeout=3)
+    processes.forget(server)
+    return not alive
+
+
+class LogTail:
+    """Reads the lines appended to a log file since the last read.
+
+    Only new data is read, from the tracked position; if the file is
+    replaced, as latest.log is on every server start, or truncated,
+    reading starts over from the beginning of the new file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._partial = b''
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._inode = None
+            self._pos = 0
+        else:
+            self._inode = stat.st_ino
+            self._pos = stat.st_size
+
+    def read_lines(self) -> List[str]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return []
+        if stat.st_ino != self._inode or stat.st_size < self._pos:
+            self._inode = stat.st_ino
+            self._pos = 0
+            self._partial = b''
+        if stat.st_size == self._pos:
+            return []
+
+        with self.path.open('rb') as file:
+            file.seek(self._pos)
+            data = self._partial + file.read()
+            self._pos = file.tell()
+        *lines, self._partial = data.split(b'\n')
+        return [line.decode(errors='replace') for line in lines]
+
+
+# Vanilla, Forge and friends log 'Done (12.345s)! For help, type "help"'.
+READY_PATTERN = r'Done \([\d.,]+s\)!'
+READY_TIMEOUT = 600
+
+
+def wait_until_ready(
+    server: str, tail: LogTail, pattern: str, timeout: float = READY_TIMEOUT
+) -> float | None:
+    """Follows a server's log until a line matches the ready pattern.
+
+    Returns the seconds it took, or None if the server did not become
+    ready within timeout, or its process went away in the meantime.
+    """
+
+    ready = re.compile(pattern)
+    started = monotonic()
+    checked = started
+    while (now := monotonic()) - started < timeout:
+        for line in tail.read_lines():
+            if ready.search(line):
+                return monotonic() - started
+        # Give the process a moment to show up before checking on it.
+        if now - checked > 5:
+            checked = now
+            if not isUp(server):
+                return None
+        sleep(0.25)
+    return None
+
+
+def record_ready(serverdir: Path, seconds: float):
+    """Appends a server's time to ready to its 'logs/spiffy_ready.log'."""
 
-    return False
+    (serverdir / 'logs').mkdir(exist_ok=True)
+    with (serverdir / 'logs' / 'spiffy_ready.log').open('a') as file:
+        file.write(f'{datetime.now().strftime("%Y-%m-%d %H:%M:%S")} {seconds:.2f}\n')
 
 
 def buildCountdownSteps(cntd):
@@ -296,18 +680,26 @@ def start(cfg: 'Settings', server: str):
     except (ParentDirMissing, ServerNotFound, NoInvocation) as e:
         e.log_this()
         return
+    console(server, server_path)
 
     if isUp(server):
         log.info(f'{server} appears to be running already!')
     else:
         invocation = get_invocation(server_path)
+        pattern = get_ready_pattern(server_path, cfg.ready_pattern)
+        tail = LogTail(server_path / 'logs' / 'latest.log')
         os.chdir(server_path)
         log.info(f'Starting {server}')
         run(['screen', '-h', '5000', '-dmS', server, *invocation, 'nogui'])
-        sleep(5)
-        if isUp(server):
-            log.info(f'{server} is now running!')
-            # run_startup_commands(server)
+        processes.forget(server)
+        ready = wait_until_ready(server, tail, pattern)
+        if ready is not None:
+            log.info(f'{server} is now running, ready after {ready:.1f}s!')
+            record_ready(server_path, ready)
+            if wants_startup_commands(server_path):
+                run_startup_commands(server)
+        elif isUp(server):
+            log.warning(f'{server} is running, but did not report ready in time!')
         else:
             log.warning(f'{server} does not appear to have started!')
 
@@ -315,6 +707,7 @@ def start(cfg: 'Settings', server: str):
 def stop(cfg: 'Settings', server, countdown=None):
     """Stops a server immediately, if it is currently running."""
 
+    console(server, cfg.parent_directory / server)
     if isUp(server):
         if countdown:
             countdownSteps = [
@@ -354,20 +747,17 @@ def stop(cfg: 'Settings', server, countdown=None):
                 sleep(step[1])
 
         log.info(f'Stopping {server} now...')
-        screenCmd(
+        responses = screenCmd(
             server,
             'title @a times 20 40 20',
             'title @a title {\"text\":\"STOPPING SERVER NOW\", \"bold\":true, \"italic\":true}',
-            f'tellraw @a {{\"text\":\"[Stopping now!]\",\"color\":\"green\"}}'
+            f'tellraw @a {{\"text\":\"[Stopping now!]\",\"color\":\"green\"}}',
             'save-all',
         )
-        sleep(15)
+        if responses is None:  # Over RCON the response means it is done.
+            sleep(15)
         screenCmd(server, 'stop')
-        waiting = 6
-        while isUp(server) and waiting > 0:
-            waiting -= 1
-            sleep(20)
-        if isUp(server):
+        if not processes.wait_for_exit(server, STOP_TIMEOUT):
             log.warning(f'{server} does not appear to have stopped!')
 
             log.warning(f'Terminating {server} process!')
@@ -388,6 +778,7 @@ def restart(cfg: 'Settings', server, countdown=None):
     except (ParentDirMissing, ServerNotFound, NoInvocation) as e:
         e.log_this()
         return
+    console(server, server_path)
 
     if isUp(server):
         countdownSteps = [
@@ -429,14 +820,13 @@ def restart(cfg: 'Settings', server, countdown=None):
                 f'tellraw @a {{\"text\":\"[Restarting in {step[0]} {step[2]}!]\",\"color\":\"green\"}}',
             )
             sleep(step[1])
-        screenCmd(server, 'save-all')
-        sleep(15)
+        if screenCmd(server, 'save-all') is None:
+            sleep(15)
         screenCmd(server, 'stop')
-        waiting = 6
-        while isUp(server) and waiting > 0:
-            waiting -= 1
-            sleep(20)
-        if isUp(server):
+        stopping = monotonic()
+        if processes.wait_for_exit(server, STOP_TIMEOUT):
+            log.info(f'{server} shut down in {monotonic() - stopping:.2f}s.')
+        else:
             log.warning(f'Restart failed, {server} appears not to have stopped!')
 
             log.warning(f'Terminating {server} process!')
@@ -444,15 +834,25 @@ def restart(cfg: 'Settings', server, countdown=None):
             if not terminated:
                 return
 
+        stopped = monotonic()
         log.info('Restart in progress...')
         invocation = get_invocation(server_path)
+        pattern = get_ready_pattern(server_path, cfg.ready_pattern)
+        tail = LogTail(server_path / 'logs' / 'latest.log')
         log.info(f'Starting {server}')
         os.chdir(server_path)
         run(['screen', '-h', '5000', '-dmS', server, *invocation, 'nogui'])
-        sleep(5)
-        if isUp(server):
-            log.info(f'Restart successful, {server} is now running!')
-            # run_startup_commands(server)
+        processes.forget(server)
+        log.info(f'{server} relaunched {monotonic() - stopped:.3f}s after shutting down.')
+        ready = wait_until_ready(server, tail, pattern)
+        if ready is not None:
+            log.info(f'Restart successful, {server} is now running, ready after {ready:.1f}s!')
+            record_ready(server_path, ready)
+            if wants_startup_commands(server_path):
+                run_startup_commands(server)
+            return True
+        elif isUp(server):
+            log.warning(f'Restart finished, but {server} did not report ready in time!')
             return True
         else:
             log.warning(f'Restart failed, {server} does not appear to have started!')
@@ -493,7 +893,37 @@ def status(server: str):
         log.info(f'{server} is not running.')
 
 
-def backup(cfg: 'Settings', server: str, specific_path: str | None = None):
+def compress(archive: Path, source_path: Path, exclusions: List[str], every: int = 1000):
+    """Writes source_path into a gzipped tar archive, leaving out
+    anything starting with one of the exclusions.
+
+    Reports the number of files archived so far every so often,
+    when running in a ProcessLane.
+    """
+
+    count = 0
+
+    def _filter(tarinfo: tarfile.TarInfo) -> tarfile.TarInfo | None:
+        nonlocal count
+        if any(tarinfo.name.startswith(ex) for ex in exclusions):
+            return None
+        count += 1
+        if count % every == 0:
+            report(count)
+        return tarinfo
+
+    with tarfile.open(archive, 'w:gz') as tf:
+        tf.add(source_path, source_path.name, filter=_filter)
+    report(count)
+    return count
+
+
+def backup(
+    cfg: 'Settings',
+    server: str,
+    specific_path: str | None = None,
+    lane: 'ProcessLane | None' = None,
+):
     """Perform backup of a given server.
 
     Backups always include the 'world' directory if it exists,
@@ -503,6 +933,8 @@ def backup(cfg: 'Settings', server: str, specific_path: str | None = None):
     Alternatively specific backups may be performed by calling this
     function with the 'specific_path' parameter pointing to a
     given servers subdirectory or file to back up instead.
+
+    If a ProcessLane is given, all archives are compressed in parallel.
     """
 
     try:
@@ -542,11 +974,13 @@ def backup(cfg: 'Settings', server: str, specific_path: str | None = None):
                 log.warning(f'Back up job for {server} failed, nothing to back up!')
                 return
 
+    console(server, server_path)
     log.info(f'Starting backup for {server}...')
     if isUp(server):
         log.info(f'{server} is running, announcing backup and toggling save!')
-        screenCmd(server, 'Starting Backup!', 'save-off', 'save-all')
-        sleep(10)
+        # Flushing makes the RCON response wait for the save to hit the disk.
+        if screenCmd(server, 'Starting Backup!', 'save-off', 'save-all flush') is None:
+            sleep(10)
 
     now = time()
     now_str = datetime.now().strftime('%Y.%m.%d_%H_%M_%S')
@@ -585,10 +1019,8 @@ def backup(cfg: 'Settings', server: str, specific_path: str | None = None):
     target_path = backup_location / f'{now_str}'
     target_path.mkdir(exist_ok=True)
 
-    os.chdir(target_path)
-
+    jobs = []
     for source_path in specification['include']:
-        log.info(f'Backing up \'{source_path}\'...')
         try:
             filename = source_path.relative_to(server_path)
         except ValueError:
@@ -605,19 +1037,29 @@ def backup(cfg: 'Settings', server: str, specific_path: str | None = None):
             for p in specification['exclude']
             if p.is_relative_to(source_path)
         ]
+        jobs.append((target_path / f'{filename}.tar.gz', source_path, exclusions))
 
-        def _filter(tarinfo: tarfile.TarInfo) -> tarfile.TarInfo | None:
-            if any(tarinfo.name.startswith(ex) for ex in exclusions):
-                return None
-            else:
-                return tarinfo
+    if lane is None:
+        for archive, source_path, exclusions in jobs:
+            log.info(f'Backing up \'{source_path}\'...')
+            compress(archive, source_path, exclusions)
+            log.info(f'\'{source_path}\' backed up!')
+    else:
+        # Every archive compresses on its own core.
+        futures = []
+        for archive, source_path, exclusions in jobs:
+            log.info(f'Backing up \'{source_path}\'...')
 
-        with tarfile.open(f'{filename}.tar.gz', 'w:gz') as tf:
-            if exclusions:
-                tf.add(source_path, source_path.name, filter=_filter)
-            else:
-                tf.add(source_path, source_path.name)
-        log.info(f'\'{source_path}\' backed up!')
+            def _progress(count, source_path=source_path):
+                log.info(f'\'{source_path}\': {count} files archived...')
+
+            future = lane.submit(
+                compress, archive, source_path, exclusions, progress=_progress
+            )
+            futures.append((source_path, future))
+        for source_path, future in futures:
+            future.result()
+            log.info(f'\'{source_path}\' backed up!')
 
     log.info(f'Backup(s) created for {server}!')
 
@@ -0,0 +1,58 @@
+import time
+
+from utils.cache import Cache
+from utils.collections import SimpleTTLDict, SizedDict
+
+
+def test_iteration_does_not_reorder():
+    c = Cache(max_size=10)
+    for i in range(5):
+        c[i] = i * 10
+    assert list(c.items()) == [(i, i * 10) for i in range(5)]
+    assert list(c.values()) == [i * 10 for i in range(5)]
+    assert list(c.keys()) == list(range(5))
+    assert dict(c) == {i: i * 10 for i in range(5)}
+    assert c.hits == 5  # Only dict(c) reads through __getitem__.
+
+
+def test_lru_eviction():
+    c = Cache(max_size=3)
+    c['a'], c['b'], c['c'] = 1, 2, 3
+    c['a']
+    c['d'] = 4
+    assert list(c) == ['c', 'a', 'd']
+    assert c.evictions == 1
+
+
+def test_ttl_expiry_on_views():
+    c = Cache(ttl=0.01)
+    c['a'] = 1
+    time.sleep(0.02)
+    assert list(c.items()) == []
+    assert c.expirations == 1
+
+
+def test_latest_index():
+    c = Cache(max_size=10)
+    c.add_index('even', lambda v: v % 2 == 0)
+    for i in range(6):
+        c[i] = i
+    assert c.latest('even', True) == 4
+    assert c.latest('even', False) == 5
+    del c[4]
+    assert c.latest('even', True) == 2
+
+
+def test_wrappers():
+    s = SizedDict(max_size=2)
+    s[1], s[2], s[3] = 'a', 'b', 'c'
+    assert list(s.items()) == [(2, 'b'), (3, 'c')]
+
+    t = SimpleTTLDict(ttl_seconds=60)
+    t['k'] = 'v'
+    ((key, (value, date)),) = t.items()
+    assert (key, value) == ('k', 'v')
+    assert abs(date - time.time()) <= 1
+    assert t['k'][0] == 'v'
+    assert t.getvalue('k') == 'v'
+    assert [v for v, _ in t.values()] == ['v']
@@ -0,0 +1,32 @@
+import asyncio
+from types import SimpleNamespace
+
+from admincogs.commandhistorian import CommandRecord
+
+
+class Channel:
+    def __init__(self):
+        self.id = 1
+        self.fetched = []
+
+    async def fetch_message(self, message_id):
+        self.fetched.append(message_id)
+        return SimpleNamespace(id=message_id)
+
+
+def record(message_id, channel):
+    message = SimpleNamespace(id=message_id, channel=channel, author=SimpleNamespace(id=2))
+    return CommandRecord(message)
+
+
+def test_fetch_prefers_message_cache():
+    channel = Channel()
+    cached = SimpleNamespace(id=10)
+    cache = {10: cached}
+    bot = SimpleNamespace(_connection=SimpleNamespace(_get_message=cache.get))
+
+    assert asyncio.run(record(10, channel).fetch(bot, channel)) is cached
+    assert channel.fetched == []
+
+    assert asyncio.run(record(11, channel).fetch(bot, channel)).id == 11
+    assert channel.fetched == [11]
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from spiffymanagement import ConsoleTransport, PipeTransport
+
+
+class Recorder(ConsoleTransport):
+    def __init__(self):
+        self.lines = []
+
+    def send(self, *lines):
+        self.lines.extend(lines)
+        return None
+
+
+@pytest.fixture
+def fifo(tmp_path):
+    path = tmp_path / 'spiffy_console'
+    os.mkfifo(path)
+    return path
+
+
+def drain(fd) -> bytes:
+    data = b''
+    while True:
+        try:
+            chunk = os.read(fd, 1 << 16)
+        except BlockingIOError:
+            return data
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_console_transport_is_abstract():
+    with pytest.raises(TypeError):
+        ConsoleTransport()
+
+
+def test_pipe_without_reader_falls_back(fifo):
+    fallback = Recorder()
+    PipeTransport(fifo, fallback).send('say a', 'say b')
+    assert fallback.lines == ['say a', 'say b']
+
+
+def test_pipe_writes_lines(fifo):
+    reader = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        fallback = Recorder()
+        transport = PipeTransport(fifo, fallback)
+        transport.send('say a', 'say b')
+        assert drain(reader) == b'say a\nsay b\n'
+        assert fallback.lines == []
+    finally:
+        os.close(reader)
+
+
+def test_full_pipe_falls_back_without_losing_or_repeating_lines(fifo):
+    reader = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        fallback = Recorder()
+        transport = PipeTransport(fifo, fallback, timeout=0.05)
+        lines = [f'say {i:05d} ' + 'x' * 1000 for i in range(200)]
+        transport.send(*lines)
+        assert fallback.lines, 'pipe should have filled up'
+
+        received = drain(reader)
+        transport.send('say last')
+        received += drain(reader)
+    finally:
+        os.close(reader)
+
+    piped = received.decode().split('\n')
+    assert piped.pop() == ''
+    assert piped[-1] == 'say last'
+    assert sorted(piped + fallback.lines) == sorted(lines + ['say last'])
@@ -0,0 +1,36 @@
+import asyncio
+from types import SimpleNamespace
+
+from discord.ext import commands
+
+from admincogs.errorhandler import ErrorHandler
+from utilitycogs.quartermaster import ProcessConverter
+from utils.exceptions import PoolSaturated
+
+
+class Ctx:
+    def __init__(self):
+        self.sent = []
+        self.command = SimpleNamespace(qualified_name='qm profile')
+
+    async def sendmarkdown(self, msg, deletable=True):
+        self.sent.append(msg)
+
+
+def handler():
+    bot = SimpleNamespace(keywords={'nacks': ['nope']}, session=None, cfg={})
+    return ErrorHandler(bot)
+
+
+def test_sendable_from_converter_is_sent():
+    ctx = Ctx()
+    error = commands.ConversionError(ProcessConverter(), PoolSaturated('subprocess'))
+    asyncio.run(handler().on_command_error(ctx, error))
+    assert ctx.sent == [PoolSaturated('subprocess').message]
+
+
+def test_sendable_from_command_is_sent():
+    ctx = Ctx()
+    error = commands.CommandInvokeError(PoolSaturated('cpu'))
+    asyncio.run(handler().on_command_error(ctx, error))
+    assert ctx.sent == [PoolSaturated('cpu').message]
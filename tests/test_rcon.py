@@ -0,0 +1,262 @@
+import asyncio
+import socket
+import struct
+import threading
+
+import pytest
+
+import spiffymanagement
+from utils.exceptions import RconAuthFailure, RconNotEnabled, ServerPropertiesMissing
+from utils.rcon import RconInterrupted, RconPool
+
+PASSWORD = 'hunter2'
+
+
+class FakeRcon:
+    """Local RCON server, as strict as vanilla's: every read has to hold
+    exactly one packet, or the connection is dropped."""
+
+    def __init__(self):
+        self.server = None
+        self.port = None
+        self.dropped = 0
+        self.commands = []
+        # Seconds the server takes to respond, per command.
+        self.delays = {}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @staticmethod
+    def _packet(request_id, kind, body):
+        payload = struct.pack('<ii', request_id, kind) + body.encode() + b'\x00\x00'
+        return struct.pack('<i', len(payload)) + payload
+
+    async def _handle(self, reader, writer):
+        authed = False
+        while True:
+            data = await reader.read(1460)
+            if not data:
+                break
+            (size,) = struct.unpack('<i', data[:4])
+            if size != len(data) - 4:
+                self.dropped += 1
+                break
+            request_id, kind = struct.unpack('<ii', data[4:12])
+            body = data[12:-2].decode()
+
+            if kind == 3:
+                authed = body == PASSWORD
+                writer.write(self._packet(request_id, 0, ''))
+                writer.write(self._packet(request_id if authed else -1, 2, ''))
+            elif kind == 2 and authed:
+                self.commands.append(body)
+                await asyncio.sleep(self.delays.get(body, 0.005))
+                response = 'x' * 10000 if body == 'big' else f'ran {body}'
+                for i in range(0, len(response), 4096):
+                    writer.write(self._packet(request_id, 0, response[i:i + 4096]))
+            elif authed:
+                writer.write(self._packet(request_id, 0, f'Unknown request {kind:x}'))
+            else:
+                break
+            await writer.drain()
+        writer.close()
+
+
+def write_properties(parent, server, port, password=PASSWORD, enabled='true'):
+    serverdir = parent / server
+    serverdir.mkdir(exist_ok=True)
+    (serverdir / 'server.properties').write_text(
+        '#Minecraft server properties\n'
+        f'enable-rcon={enabled}\n'
+        f'rcon.port={port}\n'
+        f'rcon.password={password}\n'
+    )
+    return serverdir
+
+
+def run_against_fake(tmp_path, scenario, delays=None, timeout=5, slow_timeout=5, **props):
+    async def _run():
+        fake = FakeRcon()
+        fake.delays = delays or {}
+        await fake.start()
+        write_properties(tmp_path, 'S', fake.port, **props)
+        pool = RconPool(tmp_path, timeout=timeout, slow_timeout=slow_timeout)
+        try:
+            return await scenario(pool), fake
+        finally:
+            await pool.close()
+            await fake.stop()
+
+    return asyncio.run(_run())
+
+
+def test_commands(tmp_path):
+    async def scenario(pool):
+        return await pool.command('S', 'save-off', 'save-all flush', 'say hi')
+
+    responses, fake = run_against_fake(tmp_path, scenario)
+    assert responses == ['ran save-off', 'ran save-all flush', 'ran say hi']
+    assert fake.dropped == 0
+
+
+def test_concurrent_commands_use_pool(tmp_path):
+    async def scenario(pool):
+        results = await asyncio.gather(*[pool.command('S', f'say {i}') for i in range(20)])
+        return results, len(pool._conns['S'])
+
+    (results, conns), fake = run_against_fake(tmp_path, scenario)
+    assert results == [[f'ran say {i}'] for i in range(20)]
+    assert 1 < conns <= 4
+    assert fake.dropped == 0
+
+
+def test_split_response(tmp_path):
+    async def scenario(pool):
+        return await pool.command('S', 'big', 'after')
+
+    (big, after), fake = run_against_fake(tmp_path, scenario)
+    assert big == 'x' * 10000
+    assert after == 'ran after'
+    assert fake.dropped == 0
+
+
+def test_saves_get_longer_timeout(tmp_path):
+    async def scenario(pool):
+        return await pool.command('S', 'say a', 'save-all flush', 'say b')
+
+    responses, _ = run_against_fake(
+        tmp_path, scenario, delays={'save-all flush': 0.3}, timeout=0.1, slow_timeout=2
+    )
+    assert responses == ['ran say a', 'ran save-all flush', 'ran say b']
+
+
+def test_timeout_reports_completed_commands(tmp_path):
+    async def scenario(pool):
+        with pytest.raises(RconInterrupted) as e:
+            await pool.command('S', 'say a', 'say slow', 'say b')
+        return e.value.responses
+
+    responses, fake = run_against_fake(tmp_path, scenario, delays={'say slow': 1}, timeout=0.1)
+    assert responses == ['ran say a']
+    assert 'say b' not in fake.commands
+
+
+def test_auth_failure(tmp_path):
+    async def scenario(pool):
+        with pytest.raises(RconAuthFailure):
+            await pool.command('S', 'say hi')
+
+    _, fake = run_against_fake(tmp_path, scenario, password='wrong')
+    assert fake.commands == []
+
+
+def test_rcon_disabled(tmp_path):
+    async def scenario(pool):
+        with pytest.raises(RconNotEnabled):
+            await pool.command('S', 'say hi')
+
+    run_against_fake(tmp_path, scenario, enabled='false')
+
+
+def test_properties_missing(tmp_path):
+    async def scenario():
+        with pytest.raises(ServerPropertiesMissing):
+            await RconPool(tmp_path).command('Nope', 'say hi')
+
+    asyncio.run(scenario())
+
+
+def _closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _hang_up_server():
+    """Server that accepts connections and closes them right away,
+    so the client loses the connection while logging in."""
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen()
+
+    def _serve():
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            conn.recv(1460)
+            conn.close()
+
+    threading.Thread(target=_serve, daemon=True).start()
+    return sock
+
+
+@pytest.fixture
+def screen_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(spiffymanagement, 'run', calls.append)
+    monkeypatch.setattr(spiffymanagement, '_consoles', {})
+    return calls
+
+
+def test_fallback_unreachable(tmp_path, screen_calls):
+    serverdir = write_properties(tmp_path, 'S', _closed_port())
+    transport = spiffymanagement.console('S', serverdir)
+    assert isinstance(transport, spiffymanagement.RconTransport)
+
+    assert spiffymanagement.screenCmd('S', 'save-all') is None
+    assert screen_calls == [['screen', '-S', 'S', '-X', 'stuff', 'save-all\r']]
+
+
+def test_fallback_connection_lost_during_login(tmp_path, screen_calls):
+    sock = _hang_up_server()
+    try:
+        serverdir = write_properties(tmp_path, 'S', sock.getsockname()[1])
+        spiffymanagement.console('S', serverdir)
+        assert spiffymanagement.screenCmd('S', 'say a', 'say b') is None
+    finally:
+        sock.close()
+    assert screen_calls == [['screen', '-S', 'S', '-X', 'stuff', 'say a\rsay b\r']]
+
+
+def test_rcon_transport_returns_responses(tmp_path, screen_calls):
+    fake = FakeRcon()
+    loop = spiffymanagement.RconTransport._background()
+    asyncio.run_coroutine_threadsafe(fake.start(), loop).result()
+    try:
+        serverdir = write_properties(tmp_path, 'S', fake.port)
+        spiffymanagement.console('S', serverdir)
+        assert spiffymanagement.screenCmd('S', 'save-off', 'save-all') == [
+            'ran save-off',
+            'ran save-all',
+        ]
+    finally:
+        asyncio.run_coroutine_threadsafe(fake.stop(), loop).result()
+    assert screen_calls == []
+    assert fake.dropped == 0
+
+
+def test_fallback_resends_only_unanswered_lines(tmp_path, screen_calls, monkeypatch):
+    fake = FakeRcon()
+    fake.delays = {'save-off': 1}
+    loop = spiffymanagement.RconTransport._background()
+    asyncio.run_coroutine_threadsafe(fake.start(), loop).result()
+    try:
+        serverdir = write_properties(tmp_path, 'S', fake.port)
+        monkeypatch.setitem(
+            spiffymanagement.RconTransport._pools, tmp_path, RconPool(tmp_path, timeout=0.1)
+        )
+        spiffymanagement.console('S', serverdir)
+        assert spiffymanagement.screenCmd('S', 'say Backup!', 'save-off', 'save-all') is None
+    finally:
+        asyncio.run_coroutine_threadsafe(fake.stop(), loop).result()
+    assert fake.commands.count('say Backup!') == 1
+    assert screen_calls == [['screen', '-S', 'S', '-X', 'stuff', 'save-off\rsave-all\r']]
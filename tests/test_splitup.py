@@ -0,0 +1,43 @@
+import io
+
+from hypothesis import given, strategies as st
+
+from utils.mixed import splitup
+
+# Lines, some far longer than any limit, without fences inside.
+lines = st.lists(
+    st.text(alphabet='ab \t`é\U0001f600', max_size=300).map(lambda s: s.replace('```', '`')),
+    max_size=40,
+)
+limits = st.integers(min_value=20, max_value=2000)
+
+
+@given(lines, limits, st.booleans())
+def test_plain_is_lossless_and_within_limit(parts, limit, trailing_newline):
+    msg = '\n'.join(parts) + ('\n' if trailing_newline else '')
+    chunks = list(splitup(msg, limit=limit))
+    assert ''.join(chunks) == msg
+    assert all(0 < len(chunk) <= limit for chunk in chunks)
+
+
+@given(lines, limits)
+def test_file_input_matches_string_input(parts, limit):
+    msg = ''.join(f'{part}\n' for part in parts)
+    assert list(splitup(io.StringIO(msg), limit=limit)) == list(splitup(msg, limit=limit))
+
+
+@given(lines, limits)
+def test_codeblocks_are_balanced_and_lossless(parts, limit):
+    body = ''.join(f'{part}\n' for part in parts)
+    chunks = list(splitup(f'```py\n{body}```', codeblocked=True, limit=limit))
+
+    inner = []
+    for chunk in chunks:
+        assert len(chunk) <= limit
+        assert chunk.startswith('```py\n') and chunk.endswith('\n```')
+        assert chunk.count('```') == 2
+        inner.append(chunk[len('```py\n'):-len('```')])
+    # Hard-wrapped lines get a newline before the closing fence,
+    # everything else comes through unchanged.
+    assert ''.join(inner).replace('\n', '') == body.replace('\n', '')
+    assert (''.join(inner) == body) or any(len(p) + 1 > limit - 10 for p in parts)
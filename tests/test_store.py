@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+from utils.store import Store
+
+
+def test_nested_in_list_marks_list(tmp_path):
+    path = tmp_path / 'data.json'
+
+    async def mutate():
+        s = Store(path, journaled=True)
+        s['lst'] = [{'a': 1, 'b': {'c': 1}}]
+        await s.save()
+        s['lst'][0]['a'] = 2
+        s['lst'][0]['b']['c'] = 3
+        assert s._dirty == {('lst',)}
+        await s.save()
+
+    asyncio.run(mutate())
+    assert Store(path, journaled=True)['lst'] == [{'a': 2, 'b': {'c': 3}}]
+
+
+def test_touch_into_list_journals_list(tmp_path):
+    path = tmp_path / 'data.json'
+
+    async def mutate():
+        s = Store(path, journaled=True)
+        s['lst'] = [{'a': 1}]
+        await s.save()
+        s.store['lst'][0]['a'] = 2
+        await s.save(('lst', 0, 'a'))
+
+    asyncio.run(mutate())
+    assert Store(path, journaled=True)['lst'] == [{'a': 2}]
+
+
+def test_replay_refuses_unresolvable_entries(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text('{"lst": [{"a": 1}], "n": 1}')
+    path.with_suffix('.journal').write_text(
+        '{"path": ["lst", "a"]}\n'
+        '{"path": ["n", "x"], "value": 2}\n'
+        '{"path": ["m"], "value": 3}\n'
+    )
+
+    s = Store(path, journaled=True)
+    assert s.store == {'lst': [{'a': 1}], 'n': 1, 'm': 3}
+
+
+def test_torn_tail_only_cut_by_owner(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text('{"a": 1}')
+    journal = path.with_suffix('.journal')
+    torn = b'{"path": ["b"], "value": 2}\n{"path": ["c"], "val'
+    journal.write_bytes(torn)
+
+    reader = Store(path)
+    assert reader.store == {'a': 1, 'b': 2}
+    assert journal.read_bytes() == torn
+
+    owner = Store(path, journaled=True)
+    assert owner.store == {'a': 1, 'b': 2}
+    assert journal.read_bytes() == b'{"path": ["b"], "value": 2}\n'
+
+
+def test_iterating_list_tracks_nested(tmp_path):
+    path = tmp_path / 'data.json'
+
+    async def mutate():
+        s = Store(path, journaled=True)
+        s['lst'] = [{'a': 1}, {'a': 1}]
+        s['other'] = 0
+        await s.save()
+        for entry in s['lst']:
+            entry['a'] = 2
+        s['other'] = 1
+        assert s._dirty == {('lst',), ('other',)}
+        await s.save()
+
+    asyncio.run(mutate())
+    assert Store(path, journaled=True).store == {'lst': [{'a': 2}, {'a': 2}], 'other': 1}
+
+
+def test_copy_gives_plain_containers(tmp_path):
+    s = Store(tmp_path / 'data.json')
+    s['nodes'] = {'__core__': None, 'lst': [1]}
+    nodes = s['nodes'].copy()
+    assert type(nodes) is dict and nodes == {'__core__': None, 'lst': [1]}
+    assert type(s['nodes']['lst'].copy()) is list
+    json.dumps(s['nodes'].copy())
+
+
+def test_ensured_entries_are_persisted(tmp_path):
+    path = tmp_path / 'botCfg'
+    entries = [('prefix', {}), ('nodes', {'__core__': None}), ('hierarchy', [])]
+
+    async def mutate():
+        s = Store(path, ensure_entries=entries, journaled=True)
+        s['nodes']['Admin'] = {'__core__': 'Admin'}
+        await s.save()
+        await s.close()
+
+    asyncio.run(mutate())
+    s = Store(path, ensure_entries=entries, journaled=True)
+    assert s.store['nodes'] == {'__core__': None, 'Admin': {'__core__': 'Admin'}}
+    assert s.store['prefix'] == {} and s.store['hierarchy'] == []
@@ -1,10 +1,10 @@
 import logging
 import psutil
-import asyncio
 from datetime import datetime as dt
 from humanize import naturalsize
 from discord.ext import commands
-from utils import restricted
+from utils import MetricsExporter, restricted
+from utils.permissions import PermissionLevel
 
 log = logging.getLogger(f'charfred.{__name__}')
 
@@ -23,6 +23,10 @@ class ProcessConverter(commands.Converter):
     """
 
     async def convert(self, ctx, argument):
+        with ctx.bot.metrics.timer('converter', self.__class__.__name__):
+            return await self._convert(ctx, argument)
+
+    async def _convert(self, ctx, argument):
         try:
             proc = psutil.Process(int(argument))
         except (psutil.NoSuchProcess, psutil.AccessDenied):
@@ -32,22 +36,26 @@ class ProcessConverter(commands.Converter):
         else:
             return proc
 
-        proclist = []  # Account for non-unique arguments.
-        for proc in psutil.process_iter(attrs=['pid', 'name', 'cmdline']):
-            if proc.info['name'] == argument:
-                proclist.append(proc)
-            if proc.info['cmdline']:
-                if argument in proc.info['cmdline']:
-                    proclist.append(proc)
-                if ' '.join(proc.info['cmdline']) == argument:
-                    proclist.append(proc)
-
+        proclist = await ctx.bot.executors.run('subprocess', findProcs, argument)
         if proclist:
             return proclist
         else:
             return None
 
 
+def findProcs(argument):
+    proclist = []  # Account for non-unique arguments.
+    for proc in psutil.process_iter(attrs=['pid', 'name', 'cmdline']):
+        if proc.info['name'] == argument:
+            proclist.append(proc)
+        if proc.info['cmdline']:
+            if argument in proc.info['cmdline']:
+                proclist.append(proc)
+            if ' '.join(proc.info['cmdline']) == argument:
+                proclist.append(proc)
+    return proclist
+
+
 def getProcInfo(proc):
     procinfo = {}
     high = 0.0
@@ -87,6 +95,21 @@ def format_info(process, procinfo):
 class Quartermaster(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.cfg = bot.cfg
+        self.metrics_exporter = MetricsExporter(bot.metrics)
+
+    async def cog_load(self):
+        try:
+            port = self.cfg['metricsport']
+        except KeyError:
+            return
+        try:
+            await self.metrics_exporter.start(port)
+        except OSError as e:
+            log.warning(f'QM: Metrics exporter could not be started: {e}')
+
+    async def cog_unload(self):
+        await self.metrics_exporter.stop()
 
     @commands.group(aliases=['quartermaster'])
     @restricted()
@@ -149,12 +172,11 @@ class Quartermaster(commands.Cog):
             process = process[0]
 
         tmpmsg = await ctx.sendmarkdown('> Profiling...')
-        procinfo = await asyncio.get_event_loop().run_in_executor(
-            None, getProcInfo, process
-        )
-        msg = format_info(process, procinfo)
-        await tmpmsg.delete()
-        await ctx.sendmarkdown(msg)
+        try:
+            procinfo = await ctx.bot.executors.run('cpu', getProcInfo, process, ctx=ctx)
+        finally:
+            await tmpmsg.delete()
+        await ctx.sendmarkdown(format_info(process, procinfo))
 
     @qm.command(aliases=['chartop'])
     async def charprofile(self, ctx):
@@ -171,12 +193,13 @@ class Quartermaster(commands.Cog):
         else:
 
             tmpmsg = await ctx.sendmarkdown('> Profiling...')
-            procinfo = await asyncio.get_event_loop().run_in_executor(
-                None, getProcInfo, process
-            )
-            msg = format_info(process, procinfo)
-            await tmpmsg.delete()
-            await ctx.sendmarkdown(msg)
+            try:
+                procinfo = await ctx.bot.executors.run(
+                    'cpu', getProcInfo, process, ctx=ctx
+                )
+            finally:
+                await tmpmsg.delete()
+            await ctx.sendmarkdown(format_info(process, procinfo))
 
     @qm.command(aliases=['du'])
     async def diskusage(self, ctx):
@@ -236,6 +259,143 @@ class Quartermaster(commands.Cog):
         ]
         await ctx.sendmarkdown('\n'.join(msg))
 
+    @qm.command(aliases=['pools'])
+    async def executors(self, ctx):
+        """Get worker pool usage and latency information.
+
+        Pools with jobs waiting in line are highlighted,
+        rejected counts jobs turned away because the line was full.
+        """
+
+        msg = [
+            '# Worker Pools:',
+            '> Pool        Active  Queued    Done  Failed  Rejected   Wait (med/max)    Run (med/max)',
+        ]
+        for name, stats in ctx.bot.executors.stats().items():
+            if stats['queued']:
+                prefix = '< '
+                suffix = ' >'
+            else:
+                prefix = '  '
+                suffix = ''
+            msg.append(
+                f'{prefix}{name:10} {stats["active"]:>3}/{stats["workers"]:<3}'
+                f' {stats["queued"]:>3}/{stats["max_queue"] or "-":<3}'
+                f' {stats["completed"]:>6} {stats["failed"]:>7} {stats["rejected"]:>9}'
+                f' {stats["wait_median"]:>7.3f}/{stats["wait_max"]:<7.3f}s'
+                f' {stats["run_median"]:>7.3f}/{stats["run_max"]:<7.3f}s{suffix}'
+            )
+        await ctx.sendmarkdown('\n'.join(msg))
+
+    @qm.command(aliases=['lag'])
+    async def looplag(self, ctx, reset: bool = False):
+        """Get event loop lag percentiles and the top stall offenders.
+
+        Lag is how late the event loop got around to a regular wake up,
+        stalls are lags above the threshold, charged to the command
+        or listener that was running at the time.
+
+        Pass 'true' to reset all collected data afterwards.
+        """
+
+        monitor = ctx.bot.loop_monitor
+        pcts = monitor.percentiles()
+        msg = [
+            f'# Event Loop Lag ({len(monitor.samples)} samples, every {monitor.interval}s):',
+        ]
+        if pcts:
+            msg.append('>      p50      p90      p99      max')
+            if pcts['p99'] > monitor.threshold:
+                prefix = '< '
+                suffix = ' >'
+            else:
+                prefix = '  '
+                suffix = ''
+            msg.append(
+                f'{prefix}{pcts["p50"] * 1000:>6.1f}ms {pcts["p90"] * 1000:>6.1f}ms'
+                f' {pcts["p99"] * 1000:>6.1f}ms {pcts["max"] * 1000:>6.1f}ms{suffix}'
+            )
+        else:
+            msg.append('> Not enough samples yet!')
+
+        msg.append(f'\n# Stalls over {monitor.threshold * 1000:.0f}ms: {monitor.stalls}')
+        top = monitor.top()
+        if top:
+            msg.append('>  Count    Total      Max  Offender')
+            for offender, count, total, longest in top:
+                msg.append(f'  {count:>6} {total:>7.2f}s {longest:>7.2f}s  {offender}')
+        if reset:
+            monitor.reset()
+            msg.append('\n> Collected data reset!')
+        await ctx.sendmarkdown('\n'.join(msg))
+
+    @qm.command()
+    async def stats(self, ctx, kind: str = 'command'):
+        """Get latency, invocation and error counts.
+
+        Kind may be one of command, cog, check, converter or send,
+        entries are sorted by total time spent; latency percentiles
+        are upper bounds of histogram buckets.
+        """
+
+        series = ctx.bot.metrics.series(kind)
+        if not series:
+            kinds = ', '.join(ctx.bot.metrics.kinds()) or 'none yet'
+            await ctx.sendmarkdown(f'< No {kind} metrics recorded! Known kinds: {kinds} >')
+            return
+
+        msg = [
+            f'# {kind.capitalize()} Metrics:',
+            '>  Count  Errors      Mean     p50     p95     Total  Name',
+        ]
+        for name, hist in series:
+            if hist.errors:
+                prefix = '< '
+                suffix = ' >'
+            else:
+                prefix = '  '
+                suffix = ''
+            msg.append(
+                f'{prefix}{hist.count:>5} {hist.errors:>7} {hist.mean:>8.3f}s'
+                f' {hist.quantile(0.5):>6}s {hist.quantile(0.95):>6}s'
+                f' {hist.sum:>8.2f}s  {name}{suffix}'
+            )
+        await ctx.sendmarkdown('\n'.join(msg))
+
+    @qm.command()
+    @restricted(PermissionLevel.COG)
+    async def exporter(self, ctx, port: int = None):
+        """Get or set the port of the local metrics exporter.
+
+        The exporter serves all metrics in the Prometheus text
+        format on http://127.0.0.1:<port>/metrics; a port of 0
+        disables it.
+        """
+
+        if port is None:
+            if self.metrics_exporter.running:
+                port = self.cfg['metricsport']
+                await ctx.sendmarkdown(f'# Metrics exporter running on port {port}.')
+            else:
+                await ctx.sendmarkdown('< Metrics exporter is not running! >')
+            return
+
+        if port == 0:
+            await self.metrics_exporter.stop()
+            self.cfg.pop('metricsport', None)
+            await self.cfg.save()
+            await ctx.sendmarkdown('# Metrics exporter disabled!')
+            return
+
+        try:
+            await self.metrics_exporter.start(port)
+        except OSError as e:
+            await ctx.sendmarkdown(f'< Could not listen on port {port}: {e} >')
+            return
+        self.cfg['metricsport'] = port
+        await self.cfg.save()
+        await ctx.sendmarkdown(f'# Metrics exporter running on port {port}.')
+
 
 async def setup(bot):
     await bot.add_cog(Quartermaster(bot))
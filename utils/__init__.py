@@ -1,13 +1,29 @@
 from .store import Store
-from .permissions import restricted, node_check
+from .permissions import restricted, node_check, PermissionIndex
 from .mixed import cached_property, splitup
+from .prefixes import PrefixMatcher
+from .ratelimit import TokenBucket, channel_bucket
 from .views import ConfirmationPrompt, SelectionView
 from .context import (
     CharfredContext,
 )  # TODO: Fix circular import when this is above .mixed, or .views
 from .flipbooks import Flipbook, EmbedFlipbook
+from .cache import Cache
 from .collections import SimpleTTLDict, SizedDict
+from .cmdlog import CommandLog
+from .executors import BoundedExecutor, ExecutorRegistry
+from .processlane import ProcessLane, report
+from .looplag import LoopMonitor
+from .metrics import Metrics, MetricsExporter
+from .rcon import RconPool, RconConnection, RconInterrupted
 from .exceptions import (
+    PoolSaturated,
+    RconAuthFailure,
+    RconLoginDetailsMissing,
+    RconNotEnabled,
+    RconSettingsError,
+    SendableException,
+    ServerPropertiesMissing,
     SpiffyInvocationMissing,
     SpiffyNameNotFound,
     SpiffyPathNotFound,
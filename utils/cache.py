@@ -0,0 +1,220 @@
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+
+class Cache(MutableMapping):
+    """Mapping with a bounded size and/or a time to live for its entries.
+
+    Entries are kept in recency order, once over max_size the least
+    recently used entries are evicted; with lru=False only writes count
+    as use, which gives plain insertion order eviction.
+
+    Entries older than ttl seconds are expired lazily, on reads and
+    writes, expiry walks a separate creation ordered map, so every
+    operation stays O(1) amortized.
+
+    Secondary indexes map a key derived from each value to the entries
+    producing it, so the latest entry for, e.g. a (channel, author) pair
+    can be looked up without scanning the whole cache.
+    """
+
+    def __init__(self, max_size: int | None = None, ttl: float | None = None, lru=True):
+        assert max_size is None or max_size >= 1
+        assert ttl is None or ttl >= 0
+
+        self._data = OrderedDict()
+        self._created = OrderedDict()
+        self._indexes = {}
+        self._max_size = max_size
+        self.ttl = ttl
+        self.lru = lru
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, max_size):
+        assert max_size is None or max_size >= 1
+        self._max_size = max_size
+        self._prune()
+
+    def _is_expired(self, key, now=None):
+        if self.ttl is None:
+            return False
+        return (now or time.monotonic()) - self._created[key] > self.ttl
+
+    def _expire(self):
+        """Removes all entries that have outlived their ttl."""
+
+        if self.ttl is None:
+            return
+        now = time.monotonic()
+        while self._created:
+            key = next(iter(self._created))
+            if not self._is_expired(key, now):
+                break
+            self._remove(key)
+            self.expirations += 1
+
+    def _prune(self):
+        """Evicts least recently used entries out of max_size range."""
+
+        if self._max_size is None:
+            return
+        while len(self._data) > self._max_size:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        value = self._data.pop(key)
+        self._created.pop(key, None)
+        for keyfunc, index in self._indexes.values():
+            ikey = keyfunc(value)
+            if ikey is None:
+                continue
+            try:
+                bucket = index[ikey]
+            except KeyError:
+                continue
+            bucket.pop(key, None)
+            if not bucket:
+                del index[ikey]
+        return value
+
+    def _index(self, key, value):
+        for keyfunc, index in self._indexes.values():
+            ikey = keyfunc(value)
+            if ikey is None:
+                continue
+            try:
+                index[ikey][key] = None
+            except KeyError:
+                index[ikey] = OrderedDict({key: None})
+
+    def add_index(self, name: str, keyfunc):
+        """Adds a secondary index, keyfunc derives the index key from a value,
+        values for which it returns None are left out of the index."""
+
+        self._indexes[name] = (keyfunc, {})
+        for key, value in self._data.items():
+            self._index(key, value)
+
+    def latest(self, name: str, ikey):
+        """Returns the most recently written value for an index key,
+        or None if there is none."""
+
+        bucket = self._indexes[name][1].get(ikey)
+        while bucket:
+            key = next(reversed(bucket))
+            if self._is_expired(key):
+                self._remove(key)
+                self.expirations += 1
+                continue
+            self.hits += 1
+            return self._data[key]
+        self.misses += 1
+        return None
+
+    def find(self, predicate):
+        """Finds and returns the first value that satisfies a given
+        predicate, LIFO style."""
+
+        self._expire()
+        for value in reversed(self._data.values()):
+            if predicate(value):
+                return value
+        return None
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._data),
+            'max_size': self._max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def move_to_end(self, key, last=True):
+        self._data.move_to_end(key, last)
+
+    def popitem(self, last=True):
+        if not self._data:
+            raise KeyError('popitem(): cache is empty')
+        key = next(reversed(self._data)) if last else next(iter(self._data))
+        return key, self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self._created.clear()
+        for _, index in self._indexes.values():
+            index.clear()
+
+    def __getitem__(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        if self._is_expired(key):
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            raise KeyError(key)
+        self.hits += 1
+        if self.lru:
+            self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = value
+        if self.ttl is not None:
+            self._created[key] = time.monotonic()
+        self._index(key, value)
+        self._expire()
+        self._prune()
+
+    def __delitem__(self, key):
+        self._remove(key)
+
+    def __contains__(self, key):
+        if key not in self._data:
+            return False
+        if self._is_expired(key):
+            self._remove(key)
+            self.expirations += 1
+            return False
+        return True
+
+    def __iter__(self):
+        self._expire()
+        return iter(self._data)
+
+    def __len__(self):
+        self._expire()
+        return len(self._data)
+
+    # Views read the entries directly, going through __getitem__ would
+    # reorder entries mid iteration and count every entry as a hit.
+    def keys(self):
+        self._expire()
+        return self._data.keys()
+
+    def values(self):
+        self._expire()
+        return self._data.values()
+
+    def items(self):
+        self._expire()
+        return self._data.items()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({list(self._data.items())!r})'
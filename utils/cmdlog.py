@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+import threading
+from pathlib import Path
+
+log = logging.getLogger(f'charfred.{__name__}')
+
+
+class CommandLog:
+    """Append-only command history, kept as size rotated json lines
+    segments per guild (or 'dm' for direct messages).
+
+    Entries are queued and written in batches off the event loop.
+    Every guild directory carries an index of its segments, with their
+    time range and the names of all commands they contain, so searches
+    only read the segments that can actually hold matches.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int = 1024 * 1024,
+        max_segments: int = 16,
+        flush_interval: float = 5.0,
+    ):
+        self.dir = directory
+        self.max_bytes = max_bytes
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+        self._queue = []
+        self._pending = None
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(guild_id: int | None) -> str:
+        return str(guild_id) if guild_id else 'dm'
+
+    def log(self, entry: dict):
+        """Queue an entry, entries need at least a 'time' timestamp,
+        a 'guild' id, or None, and a 'command' name."""
+
+        self._queue.append(entry)
+        if self._pending is None:
+            self._pending = asyncio.get_event_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        self._pending = None
+        try:
+            await self.flush()
+        except Exception:
+            log.exception('Writing command log failed!')
+
+    async def flush(self):
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        batch, self._queue = self._queue, []
+        if batch:
+            await asyncio.get_event_loop().run_in_executor(None, self._write, batch)
+
+    async def close(self):
+        await self.flush()
+
+    def _index(self, key: str) -> dict:
+        try:
+            return self._indexes[key]
+        except KeyError:
+            pass
+
+        indexfile = self.dir / key / 'index.json'
+        try:
+            with indexfile.open() as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            index = {'next': 0, 'segments': []}
+        self._indexes[key] = index
+        return index
+
+    def _save_index(self, key: str, index: dict):
+        indexfile = self.dir / key / 'index.json'
+        tmpfile = indexfile.with_suffix('.tmp')
+        with tmpfile.open('w') as f:
+            json.dump(index, f)
+        tmpfile.replace(indexfile)
+
+    def _new_segment(self, key: str, index: dict) -> dict:
+        segment = {
+            'file': f'{index["next"]:06}.jsonl',
+            'start': None,
+            'end': None,
+            'count': 0,
+            'commands': [],
+        }
+        index['next'] += 1
+        index['segments'].append(segment)
+
+        while len(index['segments']) > self.max_segments:
+            oldest = index['segments'].pop(0)
+            (self.dir / key / oldest['file']).unlink(missing_ok=True)
+            log.info(f'Rotated out command log {key}/{oldest["file"]}.')
+        return segment
+
+    def _write(self, batch):
+        by_guild = {}
+        for entry in batch:
+            by_guild.setdefault(self._key(entry['guild']), []).append(entry)
+
+        with self._lock:
+            for key, entries in by_guild.items():
+                (self.dir / key).mkdir(parents=True, exist_ok=True)
+                index = self._index(key)
+                if index['segments']:
+                    segment = index['segments'][-1]
+                else:
+                    segment = self._new_segment(key, index)
+
+                segfile = self.dir / key / segment['file']
+                with segfile.open('a') as f:
+                    f.write(''.join(json.dumps(e) + '\n' for e in entries))
+                    size = f.tell()
+
+                times = [e['time'] for e in entries]
+                if segment['start'] is None:
+                    segment['start'] = min(times)
+                segment['end'] = max(times)
+                segment['count'] += len(entries)
+                segment['commands'] = sorted(
+                    set(segment['commands']).union(e['command'] for e in entries)
+                )
+
+                if size >= self.max_bytes:
+                    self._new_segment(key, index)
+                self._save_index(key, index)
+
+    def _search(self, key, command, since, until, limit):
+        with self._lock:
+            segments = [dict(s) for s in self._index(key)['segments']]
+
+        results = []
+        for segment in reversed(segments):
+            if not segment['count']:
+                continue
+            if since is not None and segment['end'] < since:
+                break
+            if until is not None and segment['start'] > until:
+                continue
+            if command is not None and command not in segment['commands']:
+                continue
+
+            try:
+                with (self.dir / key / segment['file']).open() as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+
+            for line in reversed(lines):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if command is not None and entry['command'] != command:
+                    continue
+                if since is not None and entry['time'] < since:
+                    continue
+                if until is not None and entry['time'] > until:
+                    continue
+                results.append(entry)
+                if len(results) >= limit:
+                    return results
+        return results
+
+    async def search(
+        self,
+        guild_id: int | None,
+        command: str | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        limit: int = 20,
+    ):
+        """Returns up to limit entries logged for a guild, newest first,
+        optionally filtered by qualified command name and time range."""
+
+        await self.flush()
+        return await asyncio.get_event_loop().run_in_executor(
+            None, self._search, self._key(guild_id), command, since, until, limit
+        )
@@ -1,83 +1,49 @@
 import time
-from collections import OrderedDict
 
+from .cache import Cache
 
-class SimpleTTLDict(OrderedDict):
-    """Super simple implementation of an OrderedDict with expiring
+
+class SimpleTTLDict(Cache):
+    """Super simple implementation of an ordered dict with expiring
     items.
 
-    Only deletes items that have outlived their ttl when new items
-    are inserted.
+    Thin wrapper around Cache, kept for compatibility; items are
+    returned as (value, date) tuples, where date is their creation time.
     """
     def __init__(self, ttl_seconds=360):
         assert ttl_seconds >= 0
 
-        super().__init__(self)
-        self.ttl = ttl_seconds
-
-    def _expire(self):
-        """Deletes all dict items that have outlived their ttl."""
-        now = int(time.time())
-        while self:
-            (key, (value, date)) = super().popitem(last=False)
-            if now - date > self.ttl:
-                continue
-            else:
-                super().__setitem__(key, (value, date))
-                super().move_to_end(key, last=False)
-                break
-
-    def __setitem__(self, key, value):
-        """Set d[key] to (value, date), where date is its creation time.
-
-        Also removes all expired entries.
-        """
-        self._expire()
-        super().__setitem__(key, (value, int(time.time())))
-        super().move_to_end(key)
+        super().__init__(ttl=ttl_seconds, lru=False)
+
+    def __getitem__(self, key):
+        return self._dated(key, super().__getitem__(key), time.time())
 
     def getvalue(self, key):
         """Gets the value from a (value, date) tuple of a given key."""
-        return super().__getitem__(key)[0]
+        return super().__getitem__(key)
+
+    def _dated(self, key, value, now):
+        return (value, int(now - (time.monotonic() - self._created[key])))
 
-    def find(self, predicate):
-        """Finds and returns the first value that satisifies a given
-        predicate."""
-        for (value, _) in reversed(self.values()):
-            if predicate(value):
-                return value
+    def values(self):
+        now = time.time()
+        return [self._dated(k, v, now) for k, v in super().items()]
 
+    def items(self):
+        now = time.time()
+        return [(k, self._dated(k, v, now)) for k, v in super().items()]
 
-class SizedDict(OrderedDict):
-    """Super simple implementation of an OrderedDict with a fixed size.
+
+class SizedDict(Cache):
+    """Super simple implementation of an ordered dict with a fixed size.
 
     Adding a new item after maximum size has been reached removes
     the oldest item to make room.
+
+    Thin wrapper around Cache, kept for compatibility.
     """
 
     def __init__(self, max_size=100):
         assert max_size >= 1
 
-        super().__init__(self)
-        self.max_size = max_size
-
-    def __setitem__(self, key, value):
-        """Sets item and moves it to the end (in case of updates)"""
-        super().__setitem__(key, value)
-        super().move_to_end(key)
-        self._prune()
-
-    def _prune(self):
-        """Prune any items out of max_size range."""
-        while len(self) > self.max_size:
-            self.popitem(last=False)
-
-    def find(self, predicate):
-        """Finds and returns the first value that satisifies a given
-        predicate, LIFO style."""
-
-        for value in reversed(self.values()):
-            if predicate(value):
-                return value
-        else:
-            return None
+        super().__init__(max_size=max_size, lru=False)
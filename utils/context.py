@@ -1,12 +1,17 @@
+import io
 import re
 from asyncio import TimeoutError
 
+import discord
 from discord.ext import commands
 
-from utils import splitup, ConfirmationPrompt
+from utils import splitup, ConfirmationPrompt, channel_bucket
 
 
 class CharfredContext(commands.Context):
+    # Outputs longer than this are sent as a single file attachment.
+    attachment_threshold = 8000
+
     def prompt_check(self, msg):
         return msg.author.id == self.author.id and msg.channel.id == self.channel.id
 
@@ -15,29 +20,55 @@ class CharfredContext(commands.Context):
     ):
         """Helper function to send all sorts of things!
 
-        Messages are automatically split into multiple messages if they're too long,
-        and if the codeblocked parameter is True codeblock formatting is
-        preserved when such a split occurs.
+        Messages are automatically split into as few messages as possible if
+        they're too long, and if the codeblocked parameter is True codeblock
+        formatting is preserved when such a split occurs; really long messages
+        are sent as a file attachment instead.
+
+        All sends go through the channel's token bucket, to stay clear of
+        Discord's rate limits.
 
         Returns the message object for the sent message,
         if a split was performed only the last sent message is returned.
         """
         if (msg is None) or (len(msg) <= 2000):
-            outmsg = await super().send(content=msg, embed=embed, **kwargs)
+            await channel_bucket(self.channel.id).acquire()
+            # Only the API call is timed, not the wait for the bucket.
+            name = self.command.qualified_name if self.command else 'None'
+            with self.bot.metrics.timer('send', name):
+                outmsg = await super().send(content=msg, embed=embed, **kwargs)
             if deletable:
-                try:
-                    self.bot.cmd_map[self.message.id].output.append(outmsg)
-                except KeyError:
-                    pass
-                except AttributeError:
-                    pass
+                self._record(outmsg)
             return outmsg
+        elif len(msg) > self.attachment_threshold:
+            return await self._sendfile(msg, deletable, codeblocked, **kwargs)
         else:
             msgs = splitup(msg, codeblocked)
             for msg in msgs:
                 outmsg = await self.send(msg, deletable, codeblocked=codeblocked)
             return outmsg
 
+    def _record(self, outmsg):
+        """Add a message to the command output deletion chain."""
+
+        try:
+            self.bot.cmd_map[self.message.id].add_output(outmsg)
+        except KeyError:
+            pass
+        except AttributeError:
+            pass
+
+    async def _sendfile(self, msg, deletable, codeblocked, **kwargs):
+        if codeblocked:
+            msg = ''.join(msg.splitlines(keepends=True)[1:-1])
+        attachment = discord.File(io.BytesIO(msg.encode()), filename='output.txt')
+        return await self.send(
+            '```markdown\n> Output too long, see attachment!\n```',
+            deletable,
+            file=attachment,
+            **kwargs,
+        )
+
     async def sendmarkdown(self, msg, deletable=True, log=None, **kwargs) -> None:
         """Wrap a message in markdown codeblocks and send if off.
 
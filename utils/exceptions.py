@@ -58,3 +58,9 @@ class RconSettingsError(SendableException):
         super().__init__(
             f'< {server} is missing some RCON setting entries, is \'server.properties\' corrupted? >'
         )
+
+
+class PoolSaturated(SendableException):
+    def __init__(self, pool: str) -> None:
+        self.pool = pool
+        super().__init__(f'< The {pool} workers are swamped, please try again in a bit! >')
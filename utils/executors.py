@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
+
+from .exceptions import PoolSaturated
+
+log = logging.getLogger(f'charfred.{__name__}')
+
+
+class BoundedExecutor(ThreadPoolExecutor):
+    """Thread pool with a bounded backlog and some metrics.
+
+    Up to `workers` jobs run at once, further jobs wait in the queue,
+    until `max_queue` jobs are waiting, after which submissions are
+    rejected with PoolSaturated; a max_queue of None never rejects.
+
+    Queue wait and run times of the most recent jobs are kept, to
+    report latencies.
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int | None = None, samples: int = 256):
+        super().__init__(max_workers=workers, thread_name_prefix=f'charfred-{name}')
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.waits = deque(maxlen=samples)
+        self.runs = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        """Whether a new job would have to wait for a worker."""
+        return self.active + self.queued >= self.workers
+
+    @property
+    def saturated(self) -> bool:
+        """Whether a new job would be rejected."""
+        return self.max_queue is not None and self.queued >= self.max_queue and self.busy
+
+    def _job(self, fn, submitted, args, kwargs):
+        started = time.monotonic()
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self.waits.append(started - submitted)
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+                self.runs.append(time.monotonic() - started)
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._lock:
+            if self.saturated:
+                self.rejected += 1
+                raise PoolSaturated(self.name)
+            self.queued += 1
+        try:
+            return super().submit(self._job, fn, time.monotonic(), args, kwargs)
+        except BaseException:
+            with self._lock:
+                self.queued -= 1
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = list(self.waits)
+            runs = list(self.runs)
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'active': self.active,
+                'queued': self.queued,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'wait_median': median(waits) if waits else 0.0,
+                'wait_max': max(waits, default=0.0),
+                'run_median': median(runs) if runs else 0.0,
+                'run_max': max(runs, default=0.0),
+            }
+
+
+class ExecutorRegistry(Mapping):
+    """Named BoundedExecutors, one per class of blocking work,
+    so slow jobs of one class can not starve the others."""
+
+    def __init__(self):
+        self._pools = {}
+
+    def register(self, name: str, workers: int, max_queue: int | None = None) -> BoundedExecutor:
+        if name in self._pools:
+            raise KeyError(f'Executor {name} is already registered!')
+        pool = self._pools[name] = BoundedExecutor(name, workers, max_queue)
+        log.info(f'Registered {name} executor, {workers} workers, queue limit {max_queue}.')
+        return pool
+
+    async def run(self, name: str, fn, *args, ctx=None):
+        """Runs a blocking function in the named pool and returns its result.
+
+        Raises PoolSaturated if the pool's backlog is full; if ctx is
+        given, the user is told when their job has to wait in line.
+        """
+
+        pool = self._pools[name]
+        if ctx is not None and pool.busy and not pool.saturated:
+            await ctx.sendmarkdown(
+                f'> The {name} workers are busy, you are number {pool.queued + 1} in line...'
+            )
+        return await asyncio.get_event_loop().run_in_executor(pool, fn, *args)
+
+    def stats(self) -> dict:
+        return {name: pool.stats() for name, pool in self._pools.items()}
+
+    def shutdown(self, wait=True):
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __getitem__(self, name):
+        return self._pools[name]
+
+    def __iter__(self):
+        return iter(self._pools)
+
+    def __len__(self):
+        return len(self._pools)
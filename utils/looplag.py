@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from pathlib import Path
+from statistics import quantiles
+
+log = logging.getLogger(f'charfred.{__name__}')
+
+
+class LoopMonitor:
+    """Event loop lag sampler and stall detector.
+
+    A task on the loop wakes up every `interval` seconds and records
+    how late it woke up, which is how long the loop was kept busy.
+
+    A watchdog thread notices when the loop misses its wake up by more
+    than `threshold` seconds, and takes note of what is running at that
+    moment: the labelled command or the listener task, and the innermost
+    frame of the loop thread within `root`. Once the loop recovers the
+    stall is charged to that offender.
+    """
+
+    def __init__(
+        self,
+        root: Path | None = None,
+        interval: float = 0.25,
+        threshold: float = 0.1,
+        samples: int = 2400,
+    ):
+        self.root = str(root) if root else None
+        self.interval = interval
+        self.threshold = threshold
+        self.samples = deque(maxlen=samples)
+        self.offenders = {}
+        self.stalls = 0
+        self._labels = weakref.WeakKeyDictionary()
+        self._beat = time.monotonic()
+        self._suspect = None
+        self._loop = None
+        self._thread_id = None
+        self._sampler = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._sampler = self._loop.create_task(self._sample())
+        threading.Thread(target=self._watch, name='charfred-loopmonitor', daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.cancel()
+            self._sampler = None
+
+    def label(self, name: str):
+        """Labels the current task, stalls it causes are charged to name."""
+
+        task = asyncio.current_task()
+        if task is not None:
+            self._labels[task] = name
+
+    async def _sample(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = now - start - self.interval
+            self._beat = now
+            self.samples.append(lag)
+            suspect, self._suspect = self._suspect, None
+            if lag > self.threshold:
+                self._charge(suspect or 'unknown', lag)
+
+    def _charge(self, offender, lag):
+        self.stalls += 1
+        try:
+            entry = self.offenders[offender]
+        except KeyError:
+            entry = self.offenders[offender] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += lag
+        entry[2] = max(entry[2], lag)
+        log.warning(f'Event loop blocked for {lag:.3f}s by {offender}!')
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            late = time.monotonic() - self._beat - self.interval
+            if late > self.threshold and self._suspect is None:
+                self._suspect = self._culprit()
+
+    def _culprit(self) -> str:
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        if task is None:
+            what = 'loop callback'
+        else:
+            what = self._labels.get(task) or task.get_name()
+
+        frame = sys._current_frames().get(self._thread_id)
+        innermost = frame
+        while frame is not None:
+            if self.root is None or frame.f_code.co_filename.startswith(self.root):
+                break
+            frame = frame.f_back
+        frame = frame or innermost
+        if frame is None:
+            return what
+        return f'{what} @ {Path(frame.f_code.co_filename).name}:{frame.f_lineno} {frame.f_code.co_name}'
+
+    def percentiles(self) -> dict:
+        samples = list(self.samples)
+        if len(samples) < 2:
+            return {}
+        cuts = quantiles(samples, n=100, method='inclusive')
+        return {
+            'p50': cuts[49],
+            'p90': cuts[89],
+            'p99': cuts[98],
+            'max': max(samples),
+        }
+
+    def top(self, n: int = 5) -> list:
+        """Returns the n offenders that stalled the loop the longest in total,
+        as (offender, count, total, max) tuples."""
+
+        ranked = sorted(self.offenders.items(), key=lambda o: o[1][1], reverse=True)
+        return [(offender, *entry) for offender, entry in ranked[:n]]
+
+    def reset(self):
+        self.samples.clear()
+        self.offenders.clear()
+        self.stalls = 0
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+log = logging.getLogger(f'charfred.{__name__}')
+
+# Upper bounds in seconds, the last, implicit bucket is +Inf.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Fixed bucket latency histogram, with an error count."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count', 'errors')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, error=False):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile as the upper bound of the bucket it falls in,
+        the largest finite bound if it falls into the +Inf bucket."""
+
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+class Metrics:
+    """Latency histograms keyed by kind, e.g. 'command', 'cog', 'check',
+    'converter' or 'send', and a name within that kind."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, kind: str, name: str, seconds: float, error=False):
+        try:
+            hist = self._series[kind, name]
+        except KeyError:
+            hist = self._series[kind, name] = Histogram(self.buckets)
+        hist.observe(seconds, error)
+
+    @contextmanager
+    def timer(self, kind: str, name: str):
+        """Times the wrapped block, exceptions count as errors."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(kind, name, time.perf_counter() - start, error=True)
+            raise
+        self.observe(kind, name, time.perf_counter() - start)
+
+    def kinds(self) -> list:
+        return sorted({kind for kind, _ in self._series})
+
+    def series(self, kind: str) -> list:
+        """Returns (name, Histogram) pairs of a kind, by total time spent."""
+
+        found = [(name, hist) for (k, name), hist in self._series.items() if k == kind]
+        return sorted(found, key=lambda s: s[1].sum, reverse=True)
+
+    def reset(self):
+        self._series.clear()
+
+    def render(self) -> str:
+        """Renders all series in the Prometheus text exposition format."""
+
+        lines = []
+        for kind in self.kinds():
+            metric = f'charfred_{kind}_duration_seconds'
+            lines.append(f'# HELP {metric} Time spent per {kind}.')
+            lines.append(f'# TYPE {metric} histogram')
+            series = self.series(kind)
+            for name, hist in series:
+                label = f'name="{_escape(name)}"'
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {hist.count}')
+                lines.append(f'{metric}_sum{{{label}}} {hist.sum}')
+                lines.append(f'{metric}_count{{{label}}} {hist.count}')
+
+            errors = f'charfred_{kind}_errors_total'
+            lines.append(f'# HELP {errors} Failed {kind} invocations.')
+            lines.append(f'# TYPE {errors} counter')
+            for name, hist in series:
+                lines.append(f'{errors}{{name="{_escape(name)}"}} {hist.errors}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsExporter:
+    """Minimal HTTP listener, serving Metrics.render() on GET /metrics,
+    for Prometheus or anything else that can scrape it."""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self.server = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self.server and self.server.is_serving())
+
+    async def start(self, port: int, host: str = '127.0.0.1'):
+        await self.stop()
+        self.server = await asyncio.start_server(self._handle, host, port)
+        log.info(f'Metrics exporter listening on {host}:{port}.')
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+            log.info('Metrics exporter stopped.')
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+                pass  # Headers are of no interest.
+        except (asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+
+        parts = request.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            status = '200 OK'
+            body = self.metrics.render().encode()
+        else:
+            status = '404 Not Found'
+            body = b'Not found, try /metrics\n'
+
+        writer.write(
+            f'HTTP/1.1 {status}\r\n'
+            'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            'Connection: close\r\n\r\n'.encode()
+            + body
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
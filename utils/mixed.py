@@ -1,25 +1,77 @@
-def splitup(msg, codeblocked=False):
-    lines = msg.splitlines(keepends=True)
+def _iterlines(text):
+    """Lazily yields the lines of a string, line endings included."""
+
+    start = 0
+    while end := text.find('\n', start) + 1:
+        yield text[start:end]
+        start = end
+    if start < len(text):
+        yield text[start:]
+
+
+def splitup(msg, codeblocked=False, limit=2000):
+    """Splits a message into chunks of at most limit characters.
+
+    msg may be a string, or any iterable of lines, like an open file,
+    which is consumed lazily, one chunk at a time.
+
+    Lines too long for a single chunk are hard-wrapped, nothing is dropped;
+    if codeblocked, the first and last line are taken as the opening and
+    closing fence and every chunk is wrapped in a balanced codeblock.
+    """
+
+    lines = _iterlines(msg) if isinstance(msg, str) else iter(msg)
 
     if codeblocked:
-        front = lines[0]
-        back = lines[-1]
-        lines = lines[1:-1]
+        front = next(lines, '```\n')
+        if not front.endswith('\n'):
+            front += '\n'
+        close = '```'
+        # Keep one character in reserve for a newline before the fence.
+        budget = limit - len(front) - len(close) - 1
     else:
-        front = ''
-        back = ''
-
-    msgs = []
-    count = 1900
-    lastidx = 0
-    for idx, line in enumerate(lines):
-        if (count := count - len(line)) < 0:
-            msg = front + ''.join(lines[lastidx:idx]) + back
-            msgs.append(msg)
-            count = 1900
-            lastidx = idx
-
-    return msgs
+        front = close = ''
+        budget = limit
+
+    chunk = []
+    size = 0
+
+    def _flush():
+        nonlocal size
+        body = ''.join(chunk)
+        if codeblocked and body and not body.endswith('\n'):
+            body += '\n'
+        chunk.clear()
+        size = 0
+        return front + body + close
+
+    def _body():
+        # For codeblocks the last line is held back, it is the closing fence.
+        if not codeblocked:
+            yield from lines
+            return
+        held = None
+        for line in lines:
+            if held is not None:
+                yield held
+            held = line
+        if held is not None and not held.lstrip().startswith('```'):
+            yield held
+
+    for line in _body():
+        while len(line) > budget:
+            if chunk:
+                yield _flush()
+            chunk.append(line[:budget])
+            yield _flush()
+            line = line[budget:]
+        if size + len(line) > budget:
+            yield _flush()
+        chunk.append(line)
+        size += len(line)
+
+    if chunk:
+        yield _flush()
 
 
 class cached_property:
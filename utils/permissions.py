@@ -1,8 +1,11 @@
 from discord.ext import commands
 from discord.utils import find
 from enum import Enum
+from typing import Tuple
 import logging
 
+from .cache import Cache
+
 log = logging.getLogger('charfred.permissions')
 
 
@@ -13,46 +16,169 @@ class PermissionLevel(Enum):
     GLOBAL = 4
 
 
-async def node_check(ctx, level: PermissionLevel):
-    is_owner = await ctx.bot.is_owner(ctx.author)
-    if is_owner:
-        return True
-
-    try:
-        cog_node = ctx.bot.cfg['nodes'][ctx.command.cog.qualified_name]
-
-        match level:
-            case PermissionLevel.COMMAND:
-                role = cog_node[ctx.command.qualified_name]
-            case PermissionLevel.GROUP:
-                role = cog_node[ctx.command.full_parent_name]
-            case PermissionLevel.COG:
-                role = cog_node['__core__']
-            case PermissionLevel.GLOBAL:
-                role = ctx.bot.cfg['nodes']['__core__']
-    except KeyError as e:
-        log.warning(e)
-        return False
-
-    if role is None:
-        log.warning(
-            f'{ctx.author.name} lacks permission to use {ctx.command.qualified_name}'
-        )
-        return False
-
-    if role == '@everyone':
-        return True
-    else:
-        minRole = find(lambda r: r.name == role, ctx.guild.roles)
-        if minRole:
-            hierarchy = set(ctx.bot.cfg['hierarchy'])
-            roles = [r for r in ctx.author.roles if r.name in hierarchy]
-            if roles:
-                return roles[-1] >= minRole
-        log.warning(
-            f'{ctx.author.name} lacks permission to use {ctx.command.qualified_name}'
+EVERYONE = -1
+
+
+def node_path(command, level: PermissionLevel) -> Tuple[str, ...]:
+    """Returns the path of the permission node relevant
+    to a command at a given level, within the bot config."""
+
+    match level:
+        case PermissionLevel.COMMAND:
+            return ('nodes', command.cog.qualified_name, command.qualified_name)
+        case PermissionLevel.GROUP:
+            return ('nodes', command.cog.qualified_name, command.full_parent_name)
+        case PermissionLevel.COG:
+            return ('nodes', command.cog.qualified_name, '__core__')
+        case PermissionLevel.GLOBAL:
+            return ('nodes', '__core__')
+
+
+class PermissionIndex:
+    """Precompiled lookup tables for node_check.
+
+    Permission nodes are resolved once per guild into the position of
+    the required minimum role, and the role hierarchy into a frozenset
+    of role ids; both are dropped again when the bot config or the
+    roles of a guild change.
+
+    On top of that the final decisions are cached per guild, member and
+    node, in a bounded LRU map, until the member's roles change.
+    """
+
+    def __init__(self, cfg, max_decisions=4096):
+        self.cfg = cfg
+        self._minimums = {}
+        self._hierarchies = {}
+        self._decisions = Cache(max_size=max_decisions)
+        self.hits = 0
+        self.misses = 0
+        cfg.add_listener(self._on_cfg_change)
+
+    def _on_cfg_change(self, path):
+        if not path or path[0] == 'nodes':
+            self._minimums.clear()
+            self._decisions.clear()
+        if not path or path[0] == 'hierarchy':
+            self._hierarchies.clear()
+            self._decisions.clear()
+
+    def invalidate_guild(self, guild_id: int):
+        """Drop everything resolved for a guild, call this
+        whenever its roles change."""
+
+        self._minimums.pop(guild_id, None)
+        self._hierarchies.pop(guild_id, None)
+        for key in [k for k in self._decisions if k[0] == guild_id]:
+            del self._decisions[key]
+
+    @property
+    def size(self) -> int:
+        """Number of members with cached decisions."""
+
+        return len(self._decisions)
+
+    def invalidate_member(self, guild_id: int, member_id: int):
+        """Drop cached decisions for a member, call this
+        whenever their roles change."""
+
+        self._decisions.pop((guild_id, member_id), None)
+
+    def _node(self, path):
+        node = self.cfg
+        for p in path:
+            node = node[p]
+        return node
+
+    def _resolve(self, guild, path):
+        try:
+            role = self._node(path)
+        except KeyError as e:
+            log.warning(e)
+            return None
+
+        if role is None:
+            return None
+        elif role == '@everyone':
+            return EVERYONE
+        else:
+            minRole = find(lambda r: r.name == role, guild.roles)
+            return minRole.position if minRole else None
+
+    def minimum(self, guild, path) -> int | None:
+        """Position of the minimum role required by a node in a guild,
+        None if the node is owner only or its role does not exist,
+        EVERYONE if it is unrestricted."""
+
+        try:
+            return self._minimums[guild.id][path]
+        except KeyError:
+            minimum = self._resolve(guild, path)
+            self._minimums.setdefault(guild.id, {})[path] = minimum
+            return minimum
+
+    def hierarchy(self, guild) -> frozenset:
+        """Ids of all roles in a guild which are part of the hierarchy."""
+
+        try:
+            return self._hierarchies[guild.id]
+        except KeyError:
+            names = set(self.cfg['hierarchy'])
+            hierarchy = frozenset(r.id for r in guild.roles if r.name in names)
+            self._hierarchies[guild.id] = hierarchy
+            return hierarchy
+
+    def allowed(self, member, path) -> bool:
+        guild = getattr(member, 'guild', None)
+        if guild is None:
+            try:
+                return self._node(path) == '@everyone'
+            except KeyError:
+                return False
+
+        key = (guild.id, member.id)
+        try:
+            decision = self._decisions[key][path]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            return decision
+
+        decision = self._decide(guild, member, path)
+        try:
+            self._decisions[key][path] = decision
+        except KeyError:
+            self._decisions[key] = {path: decision}
+        return decision
+
+    def _decide(self, guild, member, path) -> bool:
+        minimum = self.minimum(guild, path)
+        if minimum is None:
+            return False
+        elif minimum == EVERYONE:
+            return True
+
+        hierarchy = self.hierarchy(guild)
+        top = max(
+            (r.position for r in member.roles if r.id in hierarchy), default=None
         )
-        return False
+        return top is not None and top >= minimum
+
+
+async def node_check(ctx, level: PermissionLevel):
+    with ctx.bot.metrics.timer('check', 'node_check'):
+        is_owner = await ctx.bot.is_owner(ctx.author)
+        if is_owner:
+            return True
+
+        if ctx.bot.permission_index.allowed(ctx.author, node_path(ctx.command, level)):
+            return True
+
+    log.warning(
+        f'{ctx.author.name} lacks permission to use {ctx.command.qualified_name}'
+    )
+    return False
 
 
 def restricted(level: PermissionLevel = PermissionLevel.COMMAND):
@@ -0,0 +1,60 @@
+import logging
+import re
+
+log = logging.getLogger(f'charfred.{__name__}')
+
+
+class PrefixMatcher:
+    """Resolves the prefix of a message with a single precompiled
+    alternation per guild, covering the bot mentions and all
+    prefixes configured for that guild.
+
+    Alternatives keep the order discord.py would try them in,
+    so the first matching prefix wins, just like before.
+    Patterns are rebuilt lazily whenever the prefix config changes.
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self._patterns = {}
+        self._mention = None
+        cfg.add_listener(self._on_cfg_change)
+
+    def _on_cfg_change(self, path):
+        if not path:
+            self._patterns.clear()
+        elif path[0] == 'prefix':
+            if len(path) > 1:
+                self._patterns.pop(path[1], None)
+            else:
+                self._patterns.clear()
+
+    def _compile(self, bot_id: int, guild_id: str | None):
+        prefixes = [self.mention(bot_id), f'<@!{bot_id}> ']
+        if guild_id is not None:
+            try:
+                prefixes.extend(self.cfg['prefix'][guild_id])
+            except KeyError:
+                pass
+        log.debug(f'Compiling {len(prefixes)} prefixes for {guild_id}.')
+        return re.compile('|'.join(map(re.escape, prefixes)))
+
+    def mention(self, bot_id: int) -> str:
+        """The bot mention prefix, the one prefix that always works."""
+
+        if self._mention is None:
+            self._mention = f'<@{bot_id}> '
+        return self._mention
+
+    def match(self, bot_id: int, message) -> str | None:
+        """Returns the prefix the message starts with, if any."""
+
+        guild_id = str(message.guild.id) if message.guild else None
+        try:
+            pattern = self._patterns[guild_id]
+        except KeyError:
+            pattern = self._patterns[guild_id] = self._compile(bot_id, guild_id)
+
+        if m := pattern.match(message.content):
+            return m.group()
+        return None
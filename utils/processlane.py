@@ -0,0 +1,127 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+log = logging.getLogger(f'charfred.{__name__}')
+
+# Worker side state, set up by _init_worker and _run in every worker process.
+_progress_queue = None
+_current_task = None
+
+
+def _init_worker(queue):
+    global _progress_queue
+    _progress_queue = queue
+
+
+def _run(task_id, fn, args, kwargs):
+    global _current_task
+    _current_task = task_id
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _current_task = None
+        # Sent through the same queue, so it arrives after all progress reports.
+        _progress_queue.put((task_id,))
+
+
+def report(value):
+    """Reports progress from within a job running in a ProcessLane,
+    value has to be picklable; does nothing outside of a lane."""
+
+    if _progress_queue is not None and _current_task is not None:
+        _progress_queue.put((_current_task, value))
+
+
+class ProcessLane:
+    """Process pool for CPU-bound work, which would otherwise hold the GIL,
+    stalling the event loop, or serialize on a single core.
+
+    Jobs and their arguments and results have to be picklable, so jobs
+    must be module level functions. Jobs may call `report` to stream
+    progress back, which is handed to the progress callback given on
+    submission, on a listener thread in this process.
+    """
+
+    def __init__(self, workers: int | None = None):
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context('forkserver')
+        else:
+            mp_context = multiprocessing.get_context('spawn')
+        self._queue = mp_context.SimpleQueue()
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(self._queue,),
+        )
+        self._ids = itertools.count()
+        self._callbacks = {}
+        self._listener = threading.Thread(
+            target=self._listen, name='charfred-processlane', daemon=True
+        )
+        self._listener.start()
+
+    def _listen(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if len(item) == 1:
+                self._callbacks.pop(item[0], None)
+                continue
+            task_id, value = item
+            callback = self._callbacks.get(task_id)
+            if callback is None:
+                continue
+            try:
+                callback(value)
+            except Exception:
+                log.exception('Progress callback failed!')
+
+    def submit(self, fn, *args, progress=None, **kwargs):
+        """Submits a job, returns a concurrent.futures.Future for its result.
+
+        progress is called with every value the job reports,
+        from the lane's listener thread.
+        """
+
+        task_id = next(self._ids)
+        if progress is not None:
+            self._callbacks[task_id] = progress
+        return self._pool.submit(_run, task_id, fn, args, kwargs)
+
+    async def run(self, fn, *args, progress=None, **kwargs):
+        """Runs a job and returns its result, without blocking the event loop.
+
+        progress is called on the event loop with every value the job
+        reports, it may also be a coroutine function.
+        """
+
+        loop = asyncio.get_running_loop()
+        callback = None
+        if progress is not None:
+            def _deliver(value):
+                result = progress(value)
+                if asyncio.iscoroutine(result):
+                    loop.create_task(result)
+
+            def _forward(value):
+                loop.call_soon_threadsafe(_deliver, value)
+
+            callback = _forward
+
+        return await asyncio.wrap_future(self.submit(fn, *args, progress=callback, **kwargs))
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+        self._queue.put(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from .cache import Cache
+
+
+class TokenBucket:
+    """Simple token bucket, allows bursts of up to `rate` acquisitions,
+    refilling at `rate` tokens per `per` seconds.
+
+    Acquisitions are served in order, waiting while the bucket is empty.
+    """
+
+    def __init__(self, rate: int = 5, per: float = 5.0):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.rate, self.tokens + (now - self.updated) * self.rate / self.per
+        )
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+# Discord allows 5 messages per 5 seconds in any one channel.
+_channel_buckets = Cache(max_size=512)
+
+
+def channel_bucket(channel_id: int) -> TokenBucket:
+    """Returns the send bucket for a channel."""
+
+    try:
+        return _channel_buckets[channel_id]
+    except KeyError:
+        bucket = _channel_buckets[channel_id] = TokenBucket()
+        return bucket
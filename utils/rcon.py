@@ -0,0 +1,298 @@
+import asyncio
+import itertools
+import logging
+import re
+import struct
+from pathlib import Path
+
+from .exceptions import (
+    RconAuthFailure,
+    RconLoginDetailsMissing,
+    RconNotEnabled,
+    RconSettingsError,
+    ServerPropertiesMissing,
+)
+
+log = logging.getLogger(f'charfred.{__name__}')
+
+SERVERDATA_RESPONSE_VALUE = 0
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_AUTH = 3
+# Servers answer packets of unknown type with a single response carrying
+# the same request id; sent right after a command, its response marks
+# the end of the command's (possibly split) response.
+_SENTINEL = 200
+
+_properties = {}
+
+
+def read_properties(path: Path) -> dict:
+    """Parses a server.properties file, parsed files are cached
+    until their modification time changes."""
+
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise ServerPropertiesMissing(path.parent.name)
+
+    cached = _properties.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    props = {}
+    with path.open(encoding='utf-8', errors='replace') as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith(('#', '!')):
+                continue
+            key, sep, value = line.partition('=')
+            if sep:
+                props[key.strip()] = re.sub(r'\\(.)', r'\1', value.strip())
+    _properties[path] = (mtime, props)
+    return props
+
+
+def rcon_settings(server: str, path: Path) -> tuple[int, str]:
+    """Returns the RCON port and password from a server.properties file."""
+
+    props = read_properties(path)
+    try:
+        enabled = props['enable-rcon']
+        port = props['rcon.port']
+        password = props['rcon.password']
+    except KeyError:
+        raise RconSettingsError(server)
+    if enabled.lower() != 'true':
+        raise RconNotEnabled(server)
+    if not port or not password:
+        raise RconLoginDetailsMissing(server)
+    try:
+        return int(port), password
+    except ValueError:
+        raise RconSettingsError(server)
+
+
+def _packet(request_id: int, kind: int, body: str) -> bytes:
+    payload = struct.pack('<ii', request_id, kind) + body.encode() + b'\x00\x00'
+    return struct.pack('<i', len(payload)) + payload
+
+
+# Sanity limit for incoming packets, vanilla splits responses at 4096 bytes.
+_MAX_PACKET = 1 << 16
+
+# Commands that only respond once the world has been written to disk.
+_SLOW_COMMANDS = ('save-all',)
+
+
+class RconInterrupted(ConnectionError):
+    """Raised when a connection breaks, or a command times out, partway
+    through a run of commands; responses holds the responses of all
+    commands that completed before that, in order."""
+
+    def __init__(self, server: str, responses: list):
+        self.responses = responses
+        super().__init__(
+            f'RCON to {server} broke off after {len(responses)} completed commands!'
+        )
+
+
+async def _read_packet(reader) -> tuple[int, int, str]:
+    """Reads one packet, raises ConnectionError if the connection
+    closes mid packet or the data is not a valid packet."""
+
+    try:
+        (size,) = struct.unpack('<i', await reader.readexactly(4))
+        if not 10 <= size <= _MAX_PACKET:
+            raise ConnectionError(f'Invalid RCON packet size {size}!')
+        data = await reader.readexactly(size)
+        request_id, kind = struct.unpack('<ii', data[:8])
+    except (asyncio.IncompleteReadError, struct.error) as e:
+        raise ConnectionError(f'Broken RCON packet: {e}') from e
+    return request_id, kind, data[8:-2].decode(errors='replace')
+
+
+class RconConnection:
+    """Authenticated RCON connection.
+
+    Vanilla and Forge servers read exactly one packet at a time and drop
+    the connection if a read holds more, so packets are never batched:
+    every command is sent on its own and its response awaited before
+    anything else is sent on this connection. Concurrency comes from
+    using several connections, see RconPool.
+    """
+
+    def __init__(self, server: str, settings: tuple, reader, writer):
+        self.server = server
+        self.settings = settings
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._users = 0
+
+    @classmethod
+    async def open(cls, server: str, host: str, settings: tuple, timeout: float = 10.0):
+        port, password = settings
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        conn = cls(server, settings, reader, writer)
+        try:
+            await asyncio.wait_for(conn._login(password), timeout)
+        except BaseException:
+            writer.close()
+            raise
+        return conn
+
+    async def _login(self, password: str):
+        request_id = next(self._ids)
+        self._writer.write(_packet(request_id, SERVERDATA_AUTH, password))
+        await self._writer.drain()
+        while True:
+            response_id, kind, _ = await _read_packet(self._reader)
+            # Some servers send an empty response value ahead of the auth response.
+            if kind != SERVERDATA_AUTH_RESPONSE:
+                continue
+            if response_id == -1:
+                raise RconAuthFailure(self.server, 'wrong password!')
+            if response_id == request_id:
+                return
+
+    async def _send(self, request_id: int, kind: int, body: str):
+        self._writer.write(_packet(request_id, kind, body))
+        await self._writer.drain()
+
+    async def _receive(self, request_id: int) -> str:
+        while True:
+            response_id, _, body = await _read_packet(self._reader)
+            if response_id == request_id:
+                return body
+
+    async def _exchange(self, command: str) -> str:
+        command_id = next(self._ids)
+        await self._send(command_id, SERVERDATA_EXECCOMMAND, command)
+        parts = [await self._receive(command_id)]
+
+        # The server writes all parts of a split response before it reads
+        # the next packet, so the sentinel's response comes after the last.
+        sentinel_id = next(self._ids)
+        await self._send(sentinel_id, _SENTINEL, '')
+        while True:
+            response_id, _, body = await _read_packet(self._reader)
+            if response_id == sentinel_id:
+                return ''.join(parts)
+            if response_id == command_id:
+                parts.append(body)
+
+    @property
+    def closed(self) -> bool:
+        return self._writer.is_closing()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of callers using, or waiting to use, this connection."""
+        return self._users
+
+    async def run(
+        self, *commands: str, timeout: float = 10.0, slow_timeout: float = 120.0
+    ) -> list[str]:
+        """Runs commands one after the other and returns their responses.
+
+        Every command gets `timeout` seconds to respond, saves get
+        `slow_timeout`. A connection that times out, or breaks, is closed,
+        as there is no telling where in the stream it was left, and
+        RconInterrupted is raised with the responses gathered so far.
+        """
+
+        self._users += 1
+        try:
+            async with self._lock:
+                if self.closed:
+                    raise ConnectionError(f'RCON connection to {self.server} is closed!')
+                responses = []
+                try:
+                    for command in commands:
+                        limit = slow_timeout if command.startswith(_SLOW_COMMANDS) else timeout
+                        responses.append(await asyncio.wait_for(self._exchange(command), limit))
+                except (OSError, asyncio.TimeoutError) as e:
+                    self._writer.close()
+                    raise RconInterrupted(self.server, responses) from e
+                except BaseException:
+                    self._writer.close()
+                    raise
+                return responses
+        finally:
+            self._users -= 1
+
+    async def close(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class RconPool:
+    """Pool of authenticated RCON connections, per server.
+
+    Port and password are read from each server's server.properties,
+    connections made with outdated settings are dropped. Idle
+    connections are reused, new ones are opened while all are busy,
+    up to `size` per server, after which callers queue up on the
+    least busy connection.
+    """
+
+    def __init__(
+        self,
+        parent_directory: Path,
+        host: str = '127.0.0.1',
+        size: int = 4,
+        timeout: float = 10.0,
+        slow_timeout: float = 120.0,
+    ):
+        self.parent_directory = parent_directory
+        self.host = host
+        self.size = size
+        self.timeout = timeout
+        self.slow_timeout = slow_timeout
+        self._conns = {}
+        self._locks = {}
+
+    async def _acquire(self, server: str) -> RconConnection:
+        settings = rcon_settings(server, self.parent_directory / server / 'server.properties')
+        conns = self._conns.setdefault(server, [])
+        for conn in conns:
+            if conn.settings != settings and not conn.closed:
+                await conn.close()
+        conns[:] = [c for c in conns if not c.closed]
+
+        if conns:
+            conn = min(conns, key=lambda c: c.in_flight)
+            if conn.in_flight == 0 or len(conns) >= self.size:
+                return conn
+
+        lock = self._locks.setdefault(server, asyncio.Lock())
+        async with lock:
+            if len(conns) >= self.size:
+                return min(conns, key=lambda c: c.in_flight)
+            conn = await RconConnection.open(server, self.host, settings, self.timeout)
+            log.info(f'Opened RCON connection to {server}.')
+            conns.append(conn)
+            return conn
+
+    async def command(self, server: str, *commands: str) -> list[str]:
+        """Runs commands on a server, returns their responses in order.
+
+        Raises ServerPropertiesMissing, RconNotEnabled, RconSettingsError,
+        RconLoginDetailsMissing or RconAuthFailure if RCON is unusable,
+        OSError if the server can not be reached, RconInterrupted if
+        it stops responding partway through the commands.
+        """
+
+        conn = await self._acquire(server)
+        return await conn.run(*commands, timeout=self.timeout, slow_timeout=self.slow_timeout)
+
+    async def close(self):
+        for conns in self._conns.values():
+            for conn in conns:
+                await conn.close()
+        self._conns.clear()
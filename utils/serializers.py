@@ -0,0 +1,90 @@
+import json
+import logging
+
+log = logging.getLogger(f'charfred.{__name__}')
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class JsonSerializer:
+    """Plain stdlib json, always available."""
+
+    name = 'json'
+    suffix = '.json'
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj).encode()
+
+    def loads(self, data: bytes):
+        return json.loads(data)
+
+    @staticmethod
+    def sniff(data: bytes) -> bool:
+        return data.lstrip()[:1] in (b'{', b'[')
+
+
+class OrjsonSerializer(JsonSerializer):
+    """Same file format as JsonSerializer, but a lot faster."""
+
+    def dumps(self, obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: bytes):
+        return orjson.loads(data)
+
+
+class MsgpackSerializer:
+    """Binary msgpack, more compact and quicker to parse than json."""
+
+    name = 'msgpack'
+    suffix = '.msgpack'
+
+    def dumps(self, obj) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def loads(self, data: bytes):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+    @staticmethod
+    def sniff(data: bytes) -> bool:
+        # Stores are always maps; fixmap, map 16 or map 32.
+        return bool(data) and (0x80 <= data[0] <= 0x8F or data[0] in (0xDE, 0xDF))
+
+
+serializers = {'json': OrjsonSerializer() if orjson else JsonSerializer()}
+if msgpack:
+    serializers['msgpack'] = MsgpackSerializer()
+
+
+def get_serializer(name: str):
+    """Returns the serializer registered for name.
+
+    Raises
+    ------
+    KeyError
+        if no such serializer exists, or its backend is not installed
+    """
+
+    try:
+        return serializers[name]
+    except KeyError:
+        log.error(f'Serializer \'{name}\' is unknown or its backend is not installed!')
+        raise
+
+
+def detect(data: bytes):
+    """Returns the serializer whose format matches the header of data,
+    or None if there is no match."""
+
+    for serializer in serializers.values():
+        if serializer.sniff(data):
+            return serializer
+    return None
@@ -1,22 +1,190 @@
 import asyncio
-import json
 import logging
-from collections.abc import MutableMapping
+import os
+from collections.abc import MutableMapping, MutableSequence
 from pathlib import Path
-from typing import Any, List, Tuple
+from typing import Any, Callable, List, Tuple
+
+from .serializers import detect, get_serializer, serializers
 
 log = logging.getLogger(f'charfred.{__name__}')
 
 
+def _unwrap(value):
+    if isinstance(value, (TrackedDict, TrackedList)):
+        return value.raw
+    return value
+
+
+def _wrap(store, path, value, pinned=False):
+    if isinstance(value, dict):
+        return TrackedDict(store, path, value, pinned)
+    elif isinstance(value, list):
+        return TrackedList(store, path, value)
+    return value
+
+
+class TrackedDict(MutableMapping):
+    """View on a nested dict inside a Store,
+    reports every mutation as a dirty path to the Store.
+
+    A pinned view lives somewhere inside a list, its path is that
+    of the list and is what every mutation within marks dirty.
+    """
+
+    __slots__ = ('store', 'path', 'raw', 'pinned')
+
+    def __init__(self, store, path, raw, pinned=False):
+        self.store = store
+        self.path = path
+        self.raw = raw
+        self.pinned = pinned
+
+    def _child(self, key):
+        return self.path if self.pinned else self.path + (key,)
+
+    def __getitem__(self, key):
+        return _wrap(self.store, self._child(key), self.raw[key], self.pinned)
+
+    def __setitem__(self, key, value):
+        self.raw[key] = _unwrap(value)
+        self.store._mark(self._child(key))
+
+    def __delitem__(self, key):
+        del self.raw[key]
+        self.store._mark(self._child(key))
+
+    def __iter__(self):
+        return iter(self.raw)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __contains__(self, key):
+        return key in self.raw
+
+    def __repr__(self):
+        return repr(self.raw)
+
+    def copy(self):
+        """Plain, untracked shallow copy, as dict.copy would give."""
+        return self.raw.copy()
+
+
+class TrackedList(MutableSequence):
+    """View on a nested list inside a Store.
+
+    Lists are persisted as a whole, so any mutation,
+    including those of values nested within, marks
+    the path of the list itself as dirty.
+    """
+
+    __slots__ = ('store', 'path', 'raw')
+
+    def __init__(self, store, path, raw):
+        self.store = store
+        self.path = path
+        self.raw = raw
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.raw[index]
+        return _wrap(self.store, self.path, self.raw[index], pinned=True)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self.raw[index] = [_unwrap(v) for v in value]
+        else:
+            self.raw[index] = _unwrap(value)
+        self.store._mark(self.path)
+
+    def __delitem__(self, index):
+        del self.raw[index]
+        self.store._mark(self.path)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __iter__(self):
+        for value in self.raw:
+            yield _wrap(self.store, self.path, value, pinned=True)
+
+    def __contains__(self, value):
+        return value in self.raw
+
+    def __eq__(self, other):
+        return self.raw == _unwrap(other)
+
+    def __add__(self, other):
+        return self.raw + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self.raw
+
+    def __repr__(self):
+        return repr(self.raw)
+
+    def insert(self, index, value):
+        self.raw.insert(index, _unwrap(value))
+        self.store._mark(self.path)
+
+    def copy(self):
+        """Plain, untracked shallow copy, as list.copy would give."""
+        return self.raw.copy()
+
+
 class Store(MutableMapping):
     """MutableMapping for dynamic data storage;
-    Parses data to and from json files.
+    Parses data to and from json or msgpack files.
+
+    Unless a serializer is given, the format is picked by whichever
+    known file extension already exists and confirmed by the file
+    header on load; a store found in another format than the one
+    requested is migrated on its next save.
+
+    Nested dicts and lists are handed out as tracked views, which
+    record the paths of all mutations made through them; these
+    paths are what gets persisted and reported to listeners.
+
+    In journaled mode saves only append the changed entries to
+    a write-ahead journal next to the snapshot file, the journal
+    is compacted into the snapshot in the background once it
+    grows past the compaction threshold.
+
+    A save delay turns saving into write-behind, saves within
+    the delay are coalesced and flushed together.
     """
 
-    def __init__(self, file: Path, boot_store: Path | None = None, load: bool = True, ensure_entries: List[Tuple[str, Any]] | None = None):
-        self.file = file.with_suffix('.json')
+    def __init__(
+        self,
+        file: Path,
+        boot_store: Path | None = None,
+        load: bool = True,
+        ensure_entries: List[Tuple[str, Any]] | None = None,
+        journaled: bool = False,
+        compact_threshold: int = 256 * 1024,
+        save_delay: float = 0,
+        serializer: str | None = None,
+    ):
+        if serializer is None:
+            self.serializer = self._find_serializer(file)
+        else:
+            self.serializer = get_serializer(serializer)
+        self.file = file.with_suffix(self.serializer.suffix)
+        self.journal = file.with_suffix('.journal')
+        self._codec = serializers['json']
+        self._legacy = None
         self.lock = asyncio.Lock()
         self.boot_store = boot_store
+        self.journaled = journaled
+        self.compact_threshold = compact_threshold
+        self._journal_size = 0
+        self._dirty = set()
+        self._compaction = None
+        self.save_delay = save_delay
+        self._pending = None
+        self._full = False
+        self._listeners = []
         if load:
             try:
                 self._load()
@@ -26,20 +194,48 @@ class Store(MutableMapping):
             for (k, v) in ensure_entries:
                 if k not in self.store:
                     self.store[k] = v
+                    # Journaled saves only write what is marked dirty.
+                    self._mark((k,))
+
+    @staticmethod
+    def _find_serializer(file: Path):
+        for serializer in serializers.values():
+            if file.with_suffix(serializer.suffix).exists():
+                return serializer
+        return serializers['json']
+
+    def _find_legacy(self) -> Path | None:
+        for serializer in serializers.values():
+            legacy = self.file.with_suffix(serializer.suffix)
+            if legacy != self.file and legacy.exists():
+                return legacy
+        return None
+
+    def _read(self, file: Path):
+        data = file.read_bytes()
+        return (detect(data) or self.serializer).loads(data)
 
     def _load(self):
-        if not self.file.exists():
+        self._load_snapshot()
+        self._replay()
+        self._dirty.clear()
+
+    def _load_snapshot(self):
+        source = self.file
+        if not source.exists() and (source := self._find_legacy()) is None:
             log.info(f'{self.file} does not exist yet.')
             self.file.parent.mkdir(parents=True, exist_ok=True)
             if self.boot_store:
+                boot_store = self.boot_store
+                if not boot_store.suffix:
+                    boot_store = boot_store.with_suffix('.json')
                 try:
-                    with self.boot_store.open() as icf:
-                        self.store = json.load(icf)
+                    self.store = self._read(boot_store)
                 except OSError:
-                    log.critical(f'{self.boot_store} could not be loaded!')
+                    log.critical(f'{boot_store} could not be loaded!')
                     raise
-                except json.JSONDecodeError:
-                    log.critical(f'{self.boot_store} does not contain valid json!')
+                except ValueError:
+                    log.critical(f'{boot_store} does not contain valid data!')
                     raise
                 else:
                     log.info(f'Initialized from {self.boot_store}.')
@@ -50,34 +246,257 @@ class Store(MutableMapping):
                 return
 
         try:
-            with self.file.open() as cf:
-                self.store = json.load(cf)
+            self.store = self._read(source)
         except OSError:
-            log.critical(f'Could not load {self.file}!')
+            log.critical(f'Could not load {source}!')
             raise
-        except json.JSONDecodeError:
-            log.critical(f'{self.file} does not contain valid json!')
+        except ValueError:
+            log.critical(f'{source} does not contain valid data!')
             raise
         else:
-            log.info(f'{self.file} loaded.')
+            log.info(f'{source} loaded.')
+            if source != self.file:
+                log.info(f'{source} will be migrated to {self.file} on next save.')
+                self._legacy = source
+                self._full = True
+
+    def _replay(self):
+        """Applies all committed journal entries on top of the snapshot.
+
+        An entry is committed once its line, including the trailing
+        newline, made it to disk; replay stops at the first torn entry.
+        Only a journaled store, which owns the journal, cuts a torn entry
+        off, so that its following appends start on a clean line; others
+        merely reading the store, like spiffy, may be looking at an
+        append still in progress and leave the journal be.
+        """
+
+        self._journal_size = 0
+        if not self.journal.exists():
+            return
+
+        committed = 0
+        replayed = 0
+        with self.journal.open('rb') as jf:
+            for line in jf:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = self._codec.loads(line)
+                except ValueError:
+                    break
+                if not self._apply(entry):
+                    log.warning(f'Skipped journal entry for unresolvable path {entry["path"]}.')
+                committed += len(line)
+                replayed += 1
+
+        if self.journaled and committed < self.journal.stat().st_size:
+            log.warning(f'{self.journal} ends in a torn entry, discarding it.')
+            with self.journal.open('r+b') as jf:
+                jf.truncate(committed)
+
+        self._journal_size = committed
+        log.info(f'Replayed {replayed} entries from {self.journal}.')
+
+    def _apply(self, entry) -> bool:
+        """Applies a journal entry, entries whose path does not
+        lead through dicts only are refused and return False."""
+
+        *parents, key = entry['path']
+        node = self.store
+        for p in parents:
+            node = node.setdefault(p, {}) if isinstance(node, dict) else None
+        if not isinstance(node, dict):
+            return False
+        if 'value' in entry:
+            node[key] = entry['value']
+        else:
+            node.pop(key, None)
+        return True
+
+    def _entry(self, path: Tuple[str, ...]) -> bytes:
+        """Serializes the current state at path into a journal line,
+        a path that no longer resolves is journaled as a deletion.
+
+        Paths reaching into a list are cut back to the list,
+        since lists are only ever persisted as a whole.
+        """
+
+        node = self.store
+        for i, p in enumerate(path):
+            if not isinstance(node, dict):
+                path = path[:i]
+                break
+            try:
+                node = node[p]
+            except KeyError:
+                return self._codec.dumps({'path': path}) + b'\n'
+        return self._codec.dumps({'path': path, 'value': node}) + b'\n'
+
+    def _append(self, lines: List[bytes]):
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        with self.journal.open('ab') as jf:
+            jf.write(b''.join(lines))
+            jf.flush()
+            os.fsync(jf.fileno())
+            self._journal_size = jf.tell()
 
     def _save(self):
         self.file.parent.mkdir(parents=True, exist_ok=True)
         tmpfile = self.file.with_suffix('.tmp')
-        with tmpfile.open('w') as tmp:
-            json.dump(self.store.copy(), tmp)
+        with tmpfile.open('wb') as tmp:
+            tmp.write(self.serializer.dumps(self.store.copy()))
+            if self.journaled:
+                tmp.flush()
+                os.fsync(tmp.fileno())
         tmpfile.replace(self.file)
+        if self._legacy is not None:
+            self._legacy.unlink(missing_ok=True)
+            log.info(f'Migrated {self._legacy} to {self.file}.')
+            self._legacy = None
+        # Replaying entries onto a snapshot that already contains them
+        # is harmless, so a crash before this unlink loses nothing.
+        self.journal.unlink(missing_ok=True)
+        self._journal_size = 0
 
-    async def save(self):
+    async def _compact(self):
         async with self.lock:
+            log.info(f'Compacting {self.journal} into {self.file}.')
+            await asyncio.get_event_loop().run_in_executor(None, self._save)
+
+    async def save(self, *paths: str | Tuple[str, ...]):
+        """Persist the store.
+
+        In journaled mode every path mutated since the last save is
+        appended to the journal, together with the given paths, either
+        top-level keys or tuples of nested keys, for changes made
+        outside of the tracked views; if nothing is known to have changed,
+        or when not journaled, a full snapshot is written instead.
+
+        With a save delay set, this only marks the store dirty and
+        schedules a flush, all saves arriving within the delay are
+        merged into that one flush.
+        """
+
+        self.touch(*paths)
+        if not (self.journaled and self._dirty):
+            self._full = True
+
+        if not self.save_delay:
+            await self._flush()
+        elif self._pending is None:
+            self._pending = asyncio.get_event_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.save_delay)
+        self._pending = None
+        try:
+            await self._flush()
+        except Exception:
+            log.exception(f'Delayed save of {self.file} failed!')
+
+    async def _flush(self):
+        async with self.lock:
+            if self._full:
+                self._full = False
+                self._dirty.clear()
+                await asyncio.get_event_loop().run_in_executor(None, self._save)
+                return
+            elif not self._dirty:
+                return
+
+            dirty, self._dirty = self._dirty, set()
+            lines = [self._entry(path) for path in self._collapse(dirty)]
+            await asyncio.get_event_loop().run_in_executor(None, self._append, lines)
+
+        if self._journal_size > self.compact_threshold and (
+            self._compaction is None or self._compaction.done()
+        ):
+            self._compaction = asyncio.get_event_loop().create_task(self._compact())
+
+    async def flush(self):
+        """Immediately write out any pending changes."""
+
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        await self._flush()
+
+    async def close(self):
+        """Flush pending changes and wait for running compactions,
+        call this before shutting down."""
+
+        await self.flush()
+        if self._compaction is not None:
+            await self._compaction
+
+    @staticmethod
+    def _collapse(paths):
+        """Drops all paths whose ancestor is also dirty,
+        since persisting the ancestor covers them."""
+
+        collapsed = []
+        covered = set()
+        for path in sorted(paths, key=len):
+            if any(path[:i] in covered for i in range(1, len(path))):
+                continue
+            covered.add(path)
+            collapsed.append(path)
+        return collapsed
+
+    def _mark(self, path: Tuple[str, ...]):
+        self._dirty.add(path)
+        for listener in self._listeners:
+            listener(path)
+
+    def touch(self, *paths: str | Tuple[str, ...]):
+        """Mark paths as changed, for mutations made directly on the
+        underlying data, so that the next journaled save picks them up."""
+
+        for p in paths:
+            self._mark((p,) if isinstance(p, str) else tuple(p))
+
+    def add_listener(self, listener: Callable[[Tuple[str, ...]], None]):
+        """Register a callable to be called with the path of every change,
+        e.g. to invalidate caches derived from the stored data.
+
+        Reloading the store calls it with an empty path.
+        """
+
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Tuple[str, ...]], None]):
+        try:
+            self._listeners.remove(listener)
+        except ValueError:
+            pass
+
+    async def migrate(self, serializer: str):
+        """Switch the store over to another serializer,
+        rewriting the snapshot in the new format right away."""
+
+        new = get_serializer(serializer)
+        async with self.lock:
+            self.serializer = new
+            if new.suffix != self.file.suffix:
+                self._legacy = self.file
+                self.file = self.file.with_suffix(new.suffix)
+            self._full = False
+            self._dirty.clear()
             await asyncio.get_event_loop().run_in_executor(None, self._save)
 
     async def load(self):
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        self._full = False
         async with self.lock:
             await asyncio.get_event_loop().run_in_executor(None, self._load)
+        for listener in self._listeners:
+            listener(())
 
     def __getitem__(self, key):
-        return self.store[key]
+        return _wrap(self, (key,), self.store[key])
 
     def __iter__(self):
         return iter(self.store)
@@ -85,8 +504,13 @@ class Store(MutableMapping):
     def __len__(self):
         return len(self.store)
 
+    def __contains__(self, key):
+        return key in self.store
+
     def __setitem__(self, key, value):
-        self.store[key] = value
+        self.store[key] = _unwrap(value)
+        self._mark((key,))
 
     def __delitem__(self, key):
         del self.store[key]
+        self._mark((key,))